@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+設定ファイル（config.json）の共有ローダー
+
+各スクリプトが個別にopen+json.loadしていたものを一箇所に集約し、
+同一プロセス内での再読込はmtimeで検知してメモ化する。
+"""
+
+import json
+import os
+from typing import Dict, Optional
+
+# パス -> (mtime, 解析済みdict) のキャッシュ
+_cache: Dict[str, tuple] = {}
+
+
+def _default_path() -> str:
+    """リポジトリ直下のconfig.jsonを指す（カレントディレクトリに依存しない）"""
+    return os.path.join(os.path.abspath(os.path.dirname(__file__)), 'config.json')
+
+
+def load_config(path: Optional[str] = None) -> Dict:
+    """
+    config.jsonを読み込む
+
+    同じファイルがすでに読み込まれていてmtimeが変わっていなければ
+    解析済みdictをそのまま返す（ファイル更新時は読み直す）。
+    """
+    path = path or _default_path()
+    mtime = os.path.getmtime(path)
+    cached = _cache.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    with open(path, 'r', encoding='utf-8') as f:
+        cfg = json.load(f)
+    _cache[path] = (mtime, cfg)
+    return cfg
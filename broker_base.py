@@ -10,7 +10,7 @@ Provides a unified interface for different broker APIs.
 """
 
 from abc import ABC, abstractmethod
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, NamedTuple
 from dataclasses import dataclass
 from discord import SyncWebhook
 import csv
@@ -38,9 +38,8 @@ class Order:
     leverage: Optional[float] = None
 
 
-@dataclass
-class Position:
-    """ポジション情報"""
+class Position(NamedTuple):
+    """ポジション情報（ポーリングごとに大量生成されるためNamedTupleでC実装の生成経路を使う）"""
     position_id: str
     symbol: str
     side: str  # "BUY" or "SELL"
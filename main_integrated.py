@@ -12,18 +12,30 @@ Integrated with robust time handling and dependency injection.
 For more information, see README.md
 """
 
+import asyncio
+import atexit
 import os
 import csv
+import functools
 import json
+import queue
 import time
 import threading
+import tracemalloc
 import logging
 import logging.handlers
 import random
+import re
+import shutil
 import sys
 import signal
+import zipfile
+from array import array
+from collections import defaultdict, deque
+from operator import itemgetter
 from threading import Lock
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timedelta, time as dtime
 from dataclasses import dataclass
 from typing import Optional, List
 from discord import SyncWebhook
@@ -33,16 +45,183 @@ import traceback
 import psutil
 import gc
 
+try:
+    import numpy as np
+except ImportError:
+    np = None  # NumPy未導入環境ではPythonループで計算する
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # orjson未導入環境では標準のjsonを使用する
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None  # pandas未導入環境ではPythonループで集計する
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None  # numba未導入環境ではnp.searchsorted判定を使用する
+
 # 新しい時刻判定ロジックをインポート
 from trading_time import TradeSchedule, SystemClock, JST
 
 # OANDA APIインポート
+import oandapyV20
+from oandapyV20.endpoints import pricing, accounts, orders, positions
 from oanda_broker import OANDABroker
 
 # ===============================
 # グローバル変数
 # ===============================
-trade_results = []  # 取引結果を保存するリスト
+# 取引結果のメモリ内アクティブウィンドウ
+# 上限到達時は古い順に自動退避される（全履歴はlogs/trades.jsonlに追記保存）
+TRADE_RESULTS_MAXLEN = 1000
+trade_results = deque(maxlen=TRADE_RESULTS_MAXLEN)
+TRADES_JSONL = os.path.join('logs', 'trades.jsonl')
+# 日付ごとの取引数・損益の集計（決済時に逐次更新、ステータス表示はO(1)参照）
+daily_stats = defaultdict(lambda: {'trades': 0, 'profit_amount': 0.0})
+
+class TradeColumns:
+    """
+    trade_resultsの数値列を列指向（SoA）で持つミラー
+    集計時に辞書の全フィールドへ触れず、連続したdouble配列だけを
+    走査できるため、履歴が増えてもキャッシュ効率が落ちない
+    """
+    def __init__(self):
+        self.exit_dates = []
+        self.profit_amounts = array('d')
+        self.profit_pips = array('d')
+
+    def __len__(self):
+        return len(self.profit_amounts)
+
+    def append(self, trade):
+        self.exit_dates.append(trade.get('exit_date'))
+        self.profit_amounts.append(float(trade.get('profit_amount', 0) or 0))
+        self.profit_pips.append(float(trade.get('profit_pips', 0) or 0))
+
+    def rebuild(self, trades):
+        """trade_resultsの差し替え（日次確定処理など）後に再構築する"""
+        self.__init__()
+        for trade in trades:
+            self.append(trade)
+
+trade_columns = TradeColumns()
+
+# 日付→取引リストの索引（当日・日付指定の抽出を全件走査なしで行う）
+trades_by_date = defaultdict(list)
+
+# 記録済み取引の最終決済時刻（execute_daily_tradesの連続性判定をO(1)にする）
+last_exit_dt = None
+
+# trade_resultsの変更世代カウンタ（DataFrameキャッシュの無効化キー。
+# dequeはmaxlen到達後はlen()が変わらないため、長さでは変更を検知できない）
+trade_results_rev = 0
+
+def _trade_date(trade):
+    """取引のexit_dateをdateオブジェクトへ正規化する（不明ならNone）"""
+    trade_date = trade.get('exit_date')
+    if isinstance(trade_date, str):
+        try:
+            return datetime.strptime(trade_date, '%Y-%m-%d').date()
+        except ValueError:
+            return None
+    if isinstance(trade_date, datetime):
+        return trade_date.date()
+    return trade_date if isinstance(trade_date, date) else None
+
+def _rebuild_trades_by_date(trades):
+    """trade_resultsの差し替え後に日付索引と最終決済時刻を作り直す"""
+    global last_exit_dt, trade_results_rev
+    trade_results_rev += 1
+    trades_by_date.clear()
+    last_exit_dt = None
+    for trade in trades:
+        trade_date = _trade_date(trade)
+        if trade_date is not None:
+            trades_by_date[trade_date].append(trade)
+        exit_dt = _get_exit_dt(trade)
+        if exit_dt is not None and (last_exit_dt is None or exit_dt > last_exit_dt):
+            last_exit_dt = exit_dt
+
+def _get_exit_dt(trade, default_dt=None):
+    """
+    決済時刻のdatetimeを返す
+    記録時にキャッシュされた値を優先し、旧形式のデータは初回アクセス時に
+    解析してキャッシュする（以後の文字列再解析を排除）
+    """
+    exit_dt = trade.get('_exit_dt')
+    if isinstance(exit_dt, datetime):
+        return exit_dt
+    exit_time_str = trade.get('exit_time')
+    if not exit_time_str:
+        return default_dt
+    try:
+        if 'T' in exit_time_str or '-' in exit_time_str:
+            # ISO形式の場合
+            exit_dt = datetime.fromisoformat(exit_time_str.replace('Z', '+00:00'))
+        else:
+            # HH:MM:SS形式の場合はexit_date（無ければdefault_dtの日付）と組み合わせる
+            base_date = _trade_date(trade) or (
+                default_dt.date() if default_dt else datetime.now().date())
+            exit_dt = datetime.combine(base_date, _parse_hms(exit_time_str))
+    except (ValueError, TypeError) as e:
+        logging.error(f"決済時刻変換エラー: {e}, exit_time_str={exit_time_str}")
+        return default_dt
+    trade['_exit_dt'] = exit_dt
+    return exit_dt
+
+def _persist_trade(trade):
+    """取引結果をJSONLへ1行追記する（メモリから退避された後も参照可能にする）"""
+    try:
+        os.makedirs(os.path.dirname(TRADES_JSONL), exist_ok=True)
+        if orjson is not None:
+            with open(TRADES_JSONL, 'ab') as f:
+                f.write(orjson.dumps(trade, default=str) + b'\n')
+        else:
+            with open(TRADES_JSONL, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(trade, ensure_ascii=False, default=str) + '\n')
+    except Exception as e:
+        logging.error(f"取引履歴の書き込みエラー: {e}")
+
+def _load_trades_from_jsonl(target_date):
+    """メモリ内ウィンドウから外れた日の取引をJSONLから読み出す"""
+    trades = []
+    if not os.path.exists(TRADES_JSONL):
+        return trades
+    date_key = str(target_date)
+    loads = orjson.loads if orjson is not None else json.loads
+    try:
+        with open(TRADES_JSONL, 'rb') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                trade = loads(line)
+                if str(trade.get('exit_date')) == date_key:
+                    trades.append(trade)
+    except Exception as e:
+        logging.error(f"取引履歴の読み込みエラー: {e}")
+    return trades
+
+def record_daily_stats(trade):
+    """取引結果を日次集計・列指向ミラー・JSONL履歴へ反映する"""
+    global last_exit_dt, trade_results_rev
+    trade_results_rev += 1
+    stats = daily_stats[trade['exit_date']]
+    stats['trades'] += 1
+    stats['profit_amount'] += trade.get('profit_amount', 0)
+    trade_columns.append(trade)
+    trade_date = _trade_date(trade)
+    if trade_date is not None:
+        trades_by_date[trade_date].append(trade)
+    exit_dt = _get_exit_dt(trade)
+    if exit_dt is not None and (last_exit_dt is None or exit_dt > last_exit_dt):
+        last_exit_dt = exit_dt
+    _persist_trade(trade)
+
 total_api_fee = 0   # 累計API手数料
 fee_records = []    # 各注文で発生した手数料の履歴 [{'date': date, 'fee': float}]
 performance_metrics = {
@@ -337,6 +516,23 @@ oanda_api = oandapyV20.API(
     environment=OANDA_ENV
 )
 
+# oandapyV20は全レスポンスを標準jsonでデコードするため、orjsonがあれば
+# 内部のjson参照をloads/dumps互換のシムに差し替える（パースが2〜5倍速い）
+if orjson is not None:
+    try:
+        class _OrjsonShim:
+            """oandapyV20が使うloads/dumpsだけを持つjson互換シム"""
+            loads = staticmethod(orjson.loads)
+
+            @staticmethod
+            def dumps(obj, **kwargs):
+                return orjson.dumps(obj).decode('utf-8')
+
+        oandapyV20.oandapyV20.json = _OrjsonShim()
+    except Exception as e:
+        # 内部構造が想定と異なる場合は標準jsonのまま動かす
+        logging.error(f"oandapyV20へのorjson適用エラー: {e}")
+
 # ===============================
 # OANDA用関数（直接コピペ）
 # ===============================
@@ -399,6 +595,8 @@ def send_order(symbol, side, size, leverage=None):
     resp = oanda_api.request(r)
     # 必要に応じてレスポンスパース
     order_id = resp["orderFillTransaction"]["id"]
+    invalidate_balance_cache()  # 約定で残高が変わるためキャッシュを破棄
+    invalidate_positions_cache()
     return {"data": [{"orderId": order_id}]}, abs(units)
 
 def close_position(symbol, position_id, size, side):
@@ -456,13 +654,43 @@ def check_current_positions(symbol):
     else:
         oanda_symbol = symbol
     
-    positions = broker.get_all_positions()
+    # 共有キャッシュから取得し、通貨ペアでフィルタする
+    positions = get_all_positions_cached()
     out = []
     for p in positions:
         if p.symbol == oanda_symbol:
             out.append(p)
     return out
 
+# ===============================
+# ポジション正規化アダプタ（実行時生成）
+# ===============================
+# ブローカーのポジションはdict形式（positionIdキー等）と属性アクセス形式
+# （Positionデータクラス）が混在する。形状ごとに専用の取り出し関数を一度だけ
+# 生成・キャッシュし、1件ごとのisinstance/getattr判定を排除する
+_position_adapter_cache = {}
+
+def _build_position_adapter(sample):
+    """ポジション1件の形状を調べ、(symbol, position_id, side, size, price)を返す関数を生成"""
+    if isinstance(sample, dict):
+        id_key = 'positionId' if 'positionId' in sample else 'position_id'
+        src = f"lambda p: (p['symbol'], p['{id_key}'], p['side'], p['size'], p['price'])"
+    else:
+        src = "lambda p: (p.symbol, p.position_id, p.side, p.size, p.price)"
+    return eval(compile(src, '<position_adapter>', 'eval'))
+
+def get_position_adapter(sample):
+    """レスポンス形状ごとに生成済みアダプタをキャッシュして返す"""
+    if isinstance(sample, dict):
+        signature = ('dict', 'positionId' in sample)
+    else:
+        signature = ('attr', type(sample).__name__)
+    adapter = _position_adapter_cache.get(signature)
+    if adapter is None:
+        adapter = _build_position_adapter(sample)
+        _position_adapter_cache[signature] = adapter
+    return adapter
+
 # ===============================
 # ブローカー初期化
 # ===============================
@@ -550,21 +778,34 @@ def setup_logging():
     console_handler.setLevel(logging.INFO)
     console_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
     
+    # キュー経由の非同期ログ出力
+    # 実際のファイル/コンソールI/Oはバックグラウンドスレッドで行い、
+    # logging呼び出し側（取引処理・コマンドハンドラ）をブロックしない
+    log_queue = queue.Queue(-1)
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    listener = logging.handlers.QueueListener(
+        log_queue,
+        main_log_handler,
+        error_log_handler,
+        trade_log_handler,
+        api_log_handler,
+        console_handler,
+        respect_handler_level=True
+    )
+    listener.start()
+    atexit.register(listener.stop)  # 終了時にキューをフラッシュ
+
     # ロガー設定
     logger = logging.getLogger()
     logger.setLevel(logging.INFO)
-    
+
     # 既存のハンドラーをクリア
     for handler in logger.handlers[:]:
         logger.removeHandler(handler)
-    
-    # 新しいハンドラーを追加
-    logger.addHandler(main_log_handler)
-    logger.addHandler(error_log_handler)
-    logger.addHandler(trade_log_handler)
-    logger.addHandler(api_log_handler)
-    logger.addHandler(console_handler)
-    
+
+    # ルートロガーにはキューハンドラーのみを追加
+    logger.addHandler(queue_handler)
+
     # 特定のロガーを設定
     trade_logger = logging.getLogger('trade')
     trade_logger.addHandler(trade_log_handler)
@@ -579,6 +820,11 @@ def setup_logging():
 # ログ設定を実行
 setup_logging()
 
+# Pythonヒープの割り当て追跡を開始
+# （フレーム深度1で計測オーバーヘッドを最小にする。RSSは共有ライブラリ分を
+#   含んで実態とずれるため、ヘルスチェックはヒープ実測値で判定する）
+tracemalloc.start(1)
+
 # ===============================
 # 新しい時刻判定システムの初期化
 # ===============================
@@ -609,6 +855,8 @@ class GracefulShutdown:
     def _signal_handler(self, signum, frame):
         logging.info(f"シャットダウンシグナルを受信: {signum}")
         self.shutdown_requested.set()
+        # スケジューラースレッドの長時間待機も同時に解除する
+        _stop_event.set()
     
     def is_shutdown_requested(self) -> bool:
         return self.shutdown_requested.is_set()
@@ -643,6 +891,13 @@ def get_memory_usage():
         'total': psutil.virtual_memory().total / 1024 / 1024  # MB
     }
 
+def _sample_system_metrics():
+    """メモリ・ディスクのシステムメトリクスを一度だけ採取する"""
+    return {
+        'memory': get_memory_usage(),
+        'disk': psutil.disk_usage('.'),
+    }
+
 def check_memory_usage():
     """メモリ使用量をチェックし、必要に応じてGCを実行（詳細版）"""
     memory_usage = get_memory_usage()
@@ -688,6 +943,56 @@ def cleanup_memory():
         logging.error(f"メモリクリーンアップエラー: {e}")
         return None
 
+# 残高キャッシュ（短TTLで重複API呼び出しを削減）
+_balance_cache = {'ts': 0.0, 'data': None}
+BALANCE_CACHE_TTL = 5  # 秒
+
+def invalidate_balance_cache():
+    """注文・決済の約定後に残高キャッシュを無効化する"""
+    _balance_cache['ts'] = 0.0
+    _balance_cache['data'] = None
+
+def get_balance_cached():
+    """
+    broker.get_balance()の短TTLキャッシュ版
+    ステータス表示・ヘルスチェック・決済通知が連続で残高を参照しても
+    TTL内はREST往復を1回に抑える
+    """
+    now = time.monotonic()
+    if _balance_cache['data'] is not None and now - _balance_cache['ts'] < BALANCE_CACHE_TTL:
+        return _balance_cache['data']
+    balance_data = broker.get_balance()
+    if balance_data:
+        _balance_cache['data'] = balance_data
+        _balance_cache['ts'] = now
+    return balance_data
+
+# ポジションキャッシュ（短TTLで重複API呼び出しを削減）
+_positions_cache = {'ts': 0.0, 'data': None}
+POSITIONS_CACHE_TTL = 2  # 秒
+
+def invalidate_positions_cache():
+    """エントリー・決済の約定後にポジションキャッシュを無効化する"""
+    _positions_cache['ts'] = 0.0
+    _positions_cache['data'] = None
+
+def get_all_positions_cached():
+    """
+    broker.get_all_positions()の短TTLキャッシュ版
+    監視ループと通貨ペア別チェックが連続で参照してもTTL内は
+    REST往復を1回に抑える
+    """
+    now = time.monotonic()
+    if _positions_cache['data'] is not None and now - _positions_cache['ts'] < POSITIONS_CACHE_TTL:
+        return _positions_cache['data']
+    data = broker.get_all_positions()
+    # 空リスト（ノーポジション）も正常な結果なのでキャッシュする
+    # （取得失敗のNoneだけキャッシュしない）
+    if data is not None:
+        _positions_cache['data'] = data
+        _positions_cache['ts'] = now
+    return data
+
 def oanda_rate_limit():
     """OANDA APIレート制限管理（120回/分）"""
     global oanda_rate_limit_state
@@ -781,6 +1086,55 @@ def send_discord_message(content):
     except Exception as e:
         logging.error(f"Discord送信エラー: {e}")
 
+# Discord通知の非同期キュー
+# 決済などのホットパスからwebhook POSTのレイテンシ（100-300ms程度）を
+# 排除するため、メッセージはキューへ積み、専用デーモンスレッドが送信する
+_discord_queue = queue.Queue(maxsize=256)  # 上限付き（詰まってもホットパスを止めない）
+
+def _discord_worker():
+    """キューのメッセージを取り出し、短時間に溜まった分をまとめて送信する"""
+    while True:
+        msgs = [_discord_queue.get()]
+        # 直後に届くメッセージを少し待って拾い、POST回数を減らす
+        time.sleep(0.25)
+        while not _discord_queue.empty():
+            try:
+                msgs.append(_discord_queue.get_nowait())
+            except queue.Empty:
+                break
+        combined = "\n---\n".join(msgs)
+        # Discord webhookの上限は2000文字
+        for i in range(0, len(combined), 2000):
+            send_discord_message(combined[i:i + 2000])
+        for _ in msgs:
+            _discord_queue.task_done()
+
+threading.Thread(target=_discord_worker, daemon=True, name="discord-notify").start()
+
+def send_discord_message_async(content):
+    """Discord通知を送信キューへ積んで即座に戻る（ホットパス用）"""
+    try:
+        _discord_queue.put_nowait(content)
+    except queue.Full:
+        # キューが満杯なら落とす（取引ループをwebhookで待たせない）
+        logging.warning("Discord通知キューが満杯のためメッセージを破棄しました")
+
+# 決済イベント通知のテンプレート（フォーマットは配信前に一度だけ行う）
+_CLOSE_EVENT_TEMPLATE = (
+    "{close_type}しました: 通貨ペア={symbol}, 売買方向={side}, "
+    "エントリー価格={entry_price}, 決済価格={exit_price}, "
+    "損益pips={profit_pips} ({profit_amount}円), ロット数={lot_size} "
+    "(決済時間: {exit_time})\n"
+    "現在の証拠金残高: {balance_amount}円"
+)
+
+def _emit_close_event(record):
+    """決済イベントを一度だけ整形し、各シンク（Discord・標準出力・ログ）へ配信する"""
+    msg = _CLOSE_EVENT_TEMPLATE.format_map(record)
+    send_discord_message_async(msg)
+    print(msg)
+    logging.info(msg)
+
 # GMO固有関数 - OANDA用関数に置き換え済み
 # def get_fx_balance():
 #     """FX口座残高を取得（OANDA版）"""
@@ -831,9 +1185,26 @@ def format_price(price, symbol):
     else:
         return f"{price:.5f}"
 
+# 主要通貨ペアのpip値を事前計算しておく（損益計算ごとの文字列判定を避ける）
+_PIP_VALUE_TABLE = {
+    s: (0.01 if "JPY" in s else 0.0001)
+    for s in (
+        "USD_JPY", "EUR_JPY", "GBP_JPY", "AUD_JPY", "NZD_JPY", "CAD_JPY", "CHF_JPY",
+        "EUR_USD", "GBP_USD", "AUD_USD", "NZD_USD", "USD_CAD", "USD_CHF", "EUR_GBP",
+    )
+}
+
+def get_pip_value(symbol):
+    """通貨ペアのpip値を返す（未知のシンボルは判定してテーブルに追加）"""
+    pip_value = _PIP_VALUE_TABLE.get(symbol)
+    if pip_value is None:
+        pip_value = 0.01 if "JPY" in symbol else 0.0001
+        _PIP_VALUE_TABLE[symbol] = pip_value
+    return pip_value
+
 def calculate_profit_pips(entry_price, exit_price, side, symbol):
     """エントリー・決済価格から損益pipsを計算"""
-    pip_value = 0.01 if "JPY" in symbol else 0.0001
+    pip_value = get_pip_value(symbol)
     if side == "BUY":
         return round((exit_price - entry_price) / pip_value, 2)
     else:
@@ -841,7 +1212,7 @@ def calculate_profit_pips(entry_price, exit_price, side, symbol):
 
 def calculate_current_profit_pips(entry_price, current_price, side, symbol):
     """現在の価格から含み損益pipsを計算"""
-    pip_value = 0.01 if "JPY" in symbol else 0.0001
+    pip_value = get_pip_value(symbol)
     
     try:
         # 型変換の統一化
@@ -867,7 +1238,7 @@ def calculate_current_profit_pips(entry_price, current_price, side, symbol):
 
 def calculate_profit_amount(entry_price, exit_price, side, symbol, size):
     """GMOコインの仕様に基づいた正確な損益計算"""
-    pip_value = 0.01 if "JPY" in symbol else 0.0001
+    pip_value = get_pip_value(symbol)
     
     # pips計算
     if side == "BUY":
@@ -1238,10 +1609,7 @@ def process_trades(trades):
                 ask = float(rate_data['ask'])
                 spread = ask - bid
                 # 通貨ペアの正しい判定
-                if pair.endswith("JPY"):
-                    pip_value = 0.01
-                else:
-                    pip_value = 0.0001
+                pip_value = get_pip_value(pair)
                 spread_pips = spread / pip_value
                 
                 logging.info(f"取引データ {i+1}: レート情報 - bid={bid}, ask={ask}, spread_pips={spread_pips}")
@@ -1475,10 +1843,7 @@ def enter_trade(trade_data):
         spread = ask - bid
         
         # 通貨ペアの正しいpip値判定
-        if pair.endswith("JPY"):
-            pip_value = 0.01
-        else:
-            pip_value = 0.0001
+        pip_value = get_pip_value(pair)
         
         spread_pips = spread / pip_value
         
@@ -1710,6 +2075,12 @@ def main_loop(schedule: TradeSchedule):
             logger.error(f"メインループでエラーが発生: {e}")
             time.sleep(5)  # エラー時は少し長めに待機
     
+    # 価格ストリームを停止してから終了する
+    try:
+        broker.stop_pricing_stream()
+    except Exception as e:
+        logger.error(f"価格ストリーム停止エラー: {e}")
+
     logger.info("グレースフルシャットダウン完了")
     send_discord_message("取引システムを停止しました")
 
@@ -1740,71 +2111,127 @@ if DISCORD_BOT_TOKEN:
             logging.error(f"Discord Bot コマンドエラー: {error}")
             await ctx.send(f"❌ コマンド実行中にエラーが発生しました: {str(error)}")
 
+    ADMIN_PERMISSION_BIT = 0x8  # discord.Permissions.administrator のビット
+
+    @functools.lru_cache(maxsize=256)
+    def _is_admin(guild_id, user_id, perms_value, ttl_bucket):
+        """権限intのデコード結果を(guild, user)単位でキャッシュする"""
+        return bool(perms_value & ADMIN_PERMISSION_BIT)
+
+    def admin_only():
+        """管理者のみ実行可能なコマンド用のチェックデコレータ"""
+        async def predicate(ctx):
+            # 60秒ごとにキャッシュキーを切り替えて古い判定を破棄する
+            ttl_bucket = int(time.time() // 60)
+            is_admin = _is_admin(
+                ctx.guild.id if ctx.guild else 0,
+                ctx.author.id,
+                ctx.author.guild_permissions.value,
+                ttl_bucket
+            )
+            if not is_admin:
+                await ctx.send("❌ このコマンドは管理者のみ実行可能です。")
+                return False
+            return True
+        return commands.check(predicate)
+
+    async def send_chunked(ctx, lines, title=None, limit=1900):
+        """
+        行イテレータをバッファリングしながらDiscordの文字数制限内で分割送信する
+        全文を先に組み立てず、バッファが一杯になり次第送信する
+        """
+        buffer = ""
+        part = 0
+        for line in lines:
+            if buffer and len(buffer) + len(line) > limit:
+                part += 1
+                header = f"{title} (Part {part}):\n" if title else ""
+                await ctx.send(header + buffer)
+                buffer = ""
+            buffer += line
+        if buffer:
+            if part:
+                part += 1
+                header = f"{title} (Part {part}):\n" if title else ""
+                await ctx.send(header + buffer)
+            else:
+                await ctx.send(buffer)
+
     @bot.command(name='kill')
+    @admin_only()
     async def kill(ctx):
         """全ポジションを即座に決済（緊急時）"""
         global trade_results
-        if not ctx.author.guild_permissions.administrator:
-            await ctx.send("❌ このコマンドは管理者のみ実行可能です。")
-            return
-        await ctx.send('🚨 全通貨ペアの全ポジション決済を実行します...')
+        # 進捗は1メッセージを編集して更新する（メッセージPOSTの往復を削減）
+        progress = await ctx.send('🚨 全通貨ペアの全ポジション決済を実行します...')
         logging.warning(f"Discord Bot: 全ポジション決済コマンド実行 by {ctx.author}")
         try:
             positions = broker.get_all_positions()
             if not positions:
-                await ctx.send('✅ 現在ポジションはありません。')
+                await progress.edit(content='✅ 現在ポジションはありません。')
                 return
             closed = []
+            closed_ids = set()
             success_count = 0
             error_count = 0
+            # 形状判定はアダプタ生成時の1回のみ。以降は単純な関数呼び出しで取り出す
+            adapter = get_position_adapter(positions[0])
             for pos in positions:
                 try:
-                    if not isinstance(pos, dict) or not all(key in pos for key in ['symbol', 'positionId', 'size', 'side', 'price']):
-                        closed.append(f"❌ 無効なポジション情報: {pos}")
-                        error_count += 1
-                        continue
-                    exit_side = 'SELL' if pos.side == 'BUY' else 'BUY'
-                    entry_price = float(pos.price)
-                    size = float(pos.size)
-                    symbol = pos.symbol
-                    executed_price = broker.close_position(symbol, pos.position_id, size, exit_side)
-                    profit_pips = calculate_profit_pips(entry_price, executed_price, pos.side, symbol)
-                    profit_amount = calculate_profit_amount(entry_price, executed_price, pos.side, symbol, size)
+                    symbol, position_id, side, size, entry_price = adapter(pos)
+                    exit_side = 'SELL' if side == 'BUY' else 'BUY'
+                    entry_price = float(entry_price)
+                    size = float(size)
+                    executed_price = broker.close_position(symbol, position_id, size, exit_side)
+                    profit_pips = calculate_profit_pips(entry_price, executed_price, side, symbol)
+                    profit_amount = calculate_profit_amount(entry_price, executed_price, side, symbol, size)
                     closed.append(
-                        f"✅ {symbol} {pos.side} {size}lot 決済\n"
+                        f"✅ {symbol} {side} {size}lot 決済\n"
                         f"エントリー価格: {entry_price}\n"
                         f"決済価格: {executed_price}\n"
                         f"損益: {profit_pips}pips ({profit_amount}円)"
                     )
                     # trade_resultsに追加
+                    closed_at = datetime.now()
                     trade_results.append({
                         "symbol": symbol,
-                        "side": pos.side,
+                        "side": side,
                         "entry_price": entry_price,
                         "exit_price": executed_price,
                         "profit_pips": profit_pips,
                         "profit_amount": profit_amount,
                         "lot_size": size,
                         "entry_time": getattr(pos, 'openTime', ''),
-                        "exit_time": datetime.now().strftime('%H:%M:%S'),
-                        "entry_date": getattr(pos, 'entry_date', datetime.now().date()),
-                        "exit_date": datetime.now().date(),
+                        "exit_time": closed_at.strftime('%H:%M:%S'),
+                        "entry_date": getattr(pos, 'entry_date', closed_at.date()),
+                        "exit_date": closed_at.date(),
+                        "_exit_dt": closed_at,  # 解析済み決済時刻（日次確定処理での再解析を省く）
                     })
+                    record_daily_stats(trade_results[-1])
+                    closed_ids.add(position_id)
                     success_count += 1
                 except Exception as e:
-                    error_msg = f"❌ {pos.get('symbol', 'Unknown')} 決済失敗: {e}"
+                    symbol_label = pos['symbol'] if isinstance(pos, dict) else getattr(pos, 'symbol', 'Unknown')
+                    error_msg = f"❌ {symbol_label} 決済失敗: {e}"
                     closed.append(error_msg)
                     error_count += 1
                     logging.error(f"ポジション決済エラー: {e}")
+            if success_count > 0:
+                invalidate_positions_cache()
             result_msg = f"**決済結果**\n成功: {success_count}件, 失敗: {error_count}件\n\n"
             result_msg += '\n\n'.join(closed)
             if len(result_msg) > 2000:
                 chunks = [result_msg[i:i+1900] for i in range(0, len(result_msg), 1900)]
-                for i, chunk in enumerate(chunks):
-                    await ctx.send(f"決済結果 (Part {i+1}/{len(chunks)}):\n{chunk}")
+                await progress.edit(content=f"決済結果 (Part 1/{len(chunks)}):\n{chunks[0]}")
+                for i, chunk in enumerate(chunks[1:], start=2):
+                    await ctx.send(f"決済結果 (Part {i}/{len(chunks)}):\n{chunk}")
             else:
-                await ctx.send(result_msg)
-            positions_after = get_all_positions()
+                await progress.edit(content=result_msg)
+            # 全件決済できた場合は再照会せず、決済済みIDとの差分で残存を判定する
+            if error_count == 0:
+                positions_after = [p for p in positions if adapter(p)[1] not in closed_ids]
+            else:
+                positions_after = broker.get_all_positions()
             if not positions_after:
                 await ctx.send('✅ 全てのポジションが決済されました。')
             else:
@@ -1818,11 +2245,9 @@ if DISCORD_BOT_TOKEN:
             logging.error(f"全ポジション決済エラー: {e}")
 
     @bot.command(name='stop')
+    @admin_only()
     async def stop(ctx):
         """ボットを停止"""
-        if not ctx.author.guild_permissions.administrator:
-            await ctx.send("❌ このコマンドは管理者のみ実行可能です。")
-            return
         await ctx.send('🛑 ボットを停止します...')
         logging.warning(f"Discord Bot: 停止コマンド実行 by {ctx.author}")
         try:
@@ -1837,33 +2262,35 @@ if DISCORD_BOT_TOKEN:
                     except Exception as e:
                         logging.error(f"停止時のポジション決済エラー: {e}")
             await ctx.send('✅ ボットを停止しました。')
-            sys.exit(0)
+            # コルーチン内でSystemExitを送出せず、接続を閉じてからループを停止する
+            # （保留タスクやHTTPコネクションを残さないため。ログはatexitでフラッシュされる）
+            loop = asyncio.get_running_loop()
+            await bot.close()
+            loop.call_later(1, loop.stop)
         except Exception as e:
             await ctx.send(f'❌ 停止中にエラーが発生しました: {e}')
             logging.error(f"停止エラー: {e}")
 
     @bot.command(name='restart')
+    @admin_only()
     async def restart(ctx):
         """ボットを再起動"""
-        if not ctx.author.guild_permissions.administrator:
-            await ctx.send("❌ このコマンドは管理者のみ実行可能です。")
-            return
-        await ctx.send('🔄 ボットを再起動します...')
+        # 進捗は1メッセージを編集して更新する
+        progress = await ctx.send('🔄 ボットを再起動します...')
         logging.warning(f"Discord Bot: 再起動コマンド実行 by {ctx.author}")
         try:
             # 設定を再読み込み
             reload_config()
-            await ctx.send('✅ 設定を再読み込みしました。')
-            
+            await progress.edit(content='✅ 設定を再読み込みしました。ヘルスチェック実行中...')
+
             # ヘルスチェックを実行
             health_status = health_check()
             if health_status['overall_health']:
-                await ctx.send('✅ システムは正常です。再起動完了。')
+                await progress.edit(content='✅ システムは正常です。再起動完了。')
             else:
-                await ctx.send('⚠️ システムに問題があります。詳細を確認してください。')
                 error_items = [item for item, status in health_status.items() if not status and item != 'overall_health']
-                await ctx.send(f'❌ 異常項目: {", ".join(error_items)}')
-                
+                await progress.edit(content=f'⚠️ システムに問題があります。詳細を確認してください。\n❌ 異常項目: {", ".join(error_items)}')
+
         except Exception as e:
             await ctx.send(f'❌ 再起動中にエラーが発生しました: {e}')
             logging.error(f"再起動エラー: {e}")
@@ -1879,39 +2306,66 @@ if DISCORD_BOT_TOKEN:
             
             position_msg = "📊 **現在のポジション**\n"
             total_pnl = 0
-            
-            for pos in positions:
+
+            # 全銘柄のティッカーを一括取得し、シンボル別に参照できる形にする
+            symbols = list({pos['symbol'] for pos in positions})
+            by_symbol = {}
+            try:
+                tickers = get_tickers(symbols)
+                if tickers and 'data' in tickers:
+                    for item in tickers['data']:
+                        by_symbol[item['symbol']] = item
+            except Exception as e:
+                logging.error(f"ティッカー一括取得エラー: {e}")
+
+            priced = [pos for pos in positions if pos['symbol'] in by_symbol]
+            unpriced = [pos for pos in positions if pos['symbol'] not in by_symbol]
+
+            # USD建てペアの円換算レートは一度だけ取得する
+            usdjpy_rate = 1.0
+            if any("JPY" not in pos['symbol'] for pos in priced):
                 try:
-                    # 現在価格を取得
-                    tickers = broker.get_tickers([pos.symbol])
-                    current_price = None
-                    if tickers and 'data' in tickers:
-                        for item in tickers['data']:
-                            if item['symbol'] == pos.symbol:
-                                current_price = item
-                                break
-                    
-                    if current_price:
-                        # 含み損益を計算
-                        if pos.side == 'BUY':
-                            profit_pips = calculate_current_profit_pips(float(pos.price), current_price, 'BUY', pos.symbol)
-                        else:
-                            profit_pips = calculate_current_profit_pips(float(pos.price), current_price, 'SELL', pos.symbol)
-                        
-                        profit_amount = calculate_profit_amount(float(pos.price), 
-                                                              float(current_price['bid']) if pos.side == 'BUY' else float(current_price['ask']), 
-                                                              pos.side, pos.symbol, pos.size)
-                        
-                        position_msg += (f"**{pos.symbol}** {pos.side} {pos.size}lot\n"
-                                       f"エントリー: {pos.price} | 現在: {current_price['bid']}/{current_price['ask']}\n"
-                                       f"損益: {profit_pips}pips ({profit_amount}円)\n\n")
-                        total_pnl += profit_amount
-                    else:
-                        position_msg += f"**{pos.symbol}** {pos.side} {pos.size}lot (価格取得失敗)\n\n"
-                        
+                    usdjpy_tickers = get_tickers(['USD_JPY'])
+                    for item in usdjpy_tickers.get('data', []):
+                        if item['symbol'] == 'USD_JPY':
+                            usdjpy_rate = float(item['bid'])
+                            break
                 except Exception as e:
-                    position_msg += f"**{pos.symbol}** エラー: {e}\n\n"
-            
+                    logging.error(f"USD/JPYレート取得エラー: {e}")
+
+            if np is not None and priced:
+                # NumPyで全ポジションの損益を一括計算（ポジション数が多い場合のPythonループ削減）
+                n = len(priced)
+                ep = np.fromiter((float(p['price']) for p in priced), dtype=np.float64, count=n)
+                side_sign = np.fromiter((1.0 if p['side'] == 'BUY' else -1.0 for p in priced), dtype=np.float64, count=n)
+                px = np.array([float(by_symbol[p['symbol']]['bid' if p['side'] == 'BUY' else 'ask']) for p in priced])
+                sz = np.fromiter((float(p['size']) for p in priced), dtype=np.float64, count=n)
+                pip = np.array([0.01 if "JPY" in p['symbol'] else 0.0001 for p in priced])
+                conv = np.array([1.0 if "JPY" in p['symbol'] else usdjpy_rate for p in priced])
+                pips_list = np.round((px - ep) * side_sign / pip, 2).tolist()
+                amount_list = np.round((px - ep) * side_sign * sz * conv, 2).tolist()
+            else:
+                # フォールバック: 従来どおりのPythonループ計算
+                pips_list = []
+                amount_list = []
+                for pos in priced:
+                    current_price = by_symbol[pos['symbol']]
+                    pips_list.append(calculate_current_profit_pips(
+                        float(pos['price']), current_price, pos['side'], pos['symbol']))
+                    exit_price = float(current_price['bid']) if pos['side'] == 'BUY' else float(current_price['ask'])
+                    amount_list.append(calculate_profit_amount(
+                        float(pos['price']), exit_price, pos['side'], pos['symbol'], pos['size']))
+
+            for pos, profit_pips, profit_amount in zip(priced, pips_list, amount_list):
+                current_price = by_symbol[pos['symbol']]
+                position_msg += (f"**{pos['symbol']}** {pos['side']} {pos['size']}lot\n"
+                               f"エントリー: {pos['price']} | 現在: {current_price['bid']}/{current_price['ask']}\n"
+                               f"損益: {profit_pips}pips ({profit_amount}円)\n\n")
+                total_pnl += profit_amount
+
+            for pos in unpriced:
+                position_msg += f"**{pos['symbol']}** {pos['side']} {pos['size']}lot (価格取得失敗)\n\n"
+
             position_msg += f"**合計損益: {total_pnl:.2f}円**"
             
             if len(position_msg) > 2000:
@@ -1931,19 +2385,22 @@ if DISCORD_BOT_TOKEN:
         try:
             status_info = get_system_status()
             if status_info:
-                status_msg = "📈 **システムステータス（詳細版）**\n"
-                status_msg += f"🕒 稼働時間: {status_info['uptime']}\n"
-                status_msg += f"💾 メモリ使用量: {status_info['memory_usage']:.1f}MB ({status_info['memory_percent']:.1f}%)\n"
-                status_msg += f"💿 ディスク空き容量: {status_info['disk_free_gb']:.1f}GB\n"
-                status_msg += f"📊 API呼び出し: {status_info['api_calls']}回\n"
-                status_msg += f"❌ APIエラー: {status_info['api_errors']}回\n"
-                status_msg += f"⚡ レートリミット: {status_info['rate_limit']}回/秒\n"
-                status_msg += f"⚠️ レートリミットエラー: {status_info['rate_limit_errors']}回\n"
-                status_msg += f"💰 今日の取引: {status_info['today_trades']}回\n"
-                status_msg += f"📈 今日の損益: {status_info['today_pnl']:.2f}円\n"
-                status_msg += f"💸 累計API手数料: {status_info['total_api_fee']:.0f}円\n"
-                status_msg += f"🔧 システム状態: {'✅ 正常' if status_info['overall_health'] else '⚠️ 注意'}"
-                
+                # +=の連結は行数分の再確保が発生するため、1つのf-stringで組み立てる
+                status_msg = (
+                    "📈 **システムステータス（詳細版）**\n"
+                    f"🕒 稼働時間: {status_info['uptime']}\n"
+                    f"💾 メモリ使用量: {status_info['memory_usage']:.1f}MB ({status_info['memory_percent']:.1f}%)\n"
+                    f"💿 ディスク空き容量: {status_info['disk_free_gb']:.1f}GB\n"
+                    f"📊 API呼び出し: {status_info['api_calls']}回\n"
+                    f"❌ APIエラー: {status_info['api_errors']}回\n"
+                    f"⚡ レートリミット: {status_info['rate_limit']}回/秒\n"
+                    f"⚠️ レートリミットエラー: {status_info['rate_limit_errors']}回\n"
+                    f"💰 今日の取引: {status_info['today_trades']}回\n"
+                    f"📈 今日の損益: {status_info['today_pnl']:.2f}円\n"
+                    f"💸 累計API手数料: {status_info['total_api_fee']:.0f}円\n"
+                    f"🔧 システム状態: {'✅ 正常' if status_info['overall_health'] else '⚠️ 注意'}"
+                )
+
                 await ctx.send(status_msg)
             else:
                 await ctx.send('❌ システム状態の取得に失敗しました。')
@@ -1956,7 +2413,8 @@ if DISCORD_BOT_TOKEN:
     async def health(ctx):
         """ヘルスチェックを実行（詳細版）"""
         try:
-            await ctx.send('🔍 詳細ヘルスチェックを実行中...')
+            # 進捗メッセージを編集して結果を表示する
+            progress = await ctx.send('🔍 詳細ヘルスチェックを実行中...')
             health_status = health_check()
             if health_status:
                 health_msg = "🏥 **詳細ヘルスチェック結果**\n"
@@ -1976,36 +2434,35 @@ if DISCORD_BOT_TOKEN:
                         health_msg += f"{emoji} {description}: {status}\n"
                 
                 health_msg += f"\n**総合判定**: {'✅ 全項目正常' if health_status['overall_health'] else '❌ 異常項目あり'}"
-                
-                await ctx.send(health_msg)
+
+                await progress.edit(content=health_msg)
             else:
-                await ctx.send('❌ ヘルスチェックの実行に失敗しました。')
+                await progress.edit(content='❌ ヘルスチェックの実行に失敗しました。')
         except Exception as e:
             error_msg = f'❌ ヘルスチェックエラー: {e}'
             await ctx.send(error_msg)
-            logging.error(f"ヘルスチェックエラー: {e}")
+            logging.error("ヘルスチェックエラー: %s", e)
 
     @bot.command(name='backup')
+    @admin_only()
     async def backup(ctx):
         """手動バックアップを実行（詳細版）"""
-        if not ctx.author.guild_permissions.administrator:
-            await ctx.send("❌ このコマンドは管理者のみ実行可能です。")
-            return
         try:
-            await ctx.send('💾 詳細バックアップを実行中...')
+            # 進捗メッセージを編集して結果を表示する
+            progress = await ctx.send('💾 詳細バックアップを実行中...')
             backup_path = backup_config_and_data()
             if backup_path:
                 # バックアップの整合性を検証
                 is_valid, message = verify_backup(backup_path)
                 if is_valid:
-                    await ctx.send(f'✅ バックアップ完了: {backup_path}\n{message}')
+                    await progress.edit(content=f'✅ バックアップ完了: {backup_path}\n{message}')
                 else:
-                    await ctx.send(f'⚠️ バックアップ完了: {backup_path}\n⚠️ 検証警告: {message}')
+                    await progress.edit(content=f'⚠️ バックアップ完了: {backup_path}\n⚠️ 検証警告: {message}')
             else:
-                await ctx.send('❌ バックアップに失敗しました。')
+                await progress.edit(content='❌ バックアップに失敗しました。')
         except Exception as e:
             await ctx.send(f'❌ バックアップ中にエラーが発生しました: {e}')
-            logging.error(f"バックアップエラー: {e}")
+            logging.error("バックアップエラー: %s", e)
 
     @bot.command(name='memory')
     async def memory(ctx):
@@ -2027,11 +2484,9 @@ if DISCORD_BOT_TOKEN:
             logging.error(f"メモリ情報取得エラー: {e}")
 
     @bot.command(name='cleanup')
+    @admin_only()
     async def cleanup(ctx):
         """メモリクリーンアップを実行"""
-        if not ctx.author.guild_permissions.administrator:
-            await ctx.send("❌ このコマンドは管理者のみ実行可能です。")
-            return
         try:
             await ctx.send('🧹 メモリクリーンアップを実行中...')
             memory_usage = cleanup_memory()
@@ -2046,11 +2501,9 @@ if DISCORD_BOT_TOKEN:
             logging.error(f"メモリクリーンアップエラー: {e}")
 
     @bot.command(name='reload')
+    @admin_only()
     async def reload_config_cmd(ctx):
         """設定を再読み込み"""
-        if not ctx.author.guild_permissions.administrator:
-            await ctx.send("❌ このコマンドは管理者のみ実行可能です。")
-            return
         try:
             await ctx.send('🔄 設定を再読み込み中...')
             if reload_config():
@@ -2080,33 +2533,20 @@ if DISCORD_BOT_TOKEN:
             # メッセージの生成
             if days_offset_int is not None:
                 if days_offset_int == -1:
-                    await ctx.send('📅 前日のパフォーマンスレポートを生成中...')
+                    title = "前日のパフォーマンスレポート"
                 elif days_offset_int == -2:
-                    await ctx.send('📅 2日前のパフォーマンスレポートを生成中...')
+                    title = "2日前のパフォーマンスレポート"
                 else:
-                    await ctx.send(f'📅 {abs(days_offset_int)}日前のパフォーマンスレポートを生成中...')
-                report = get_performance_report(use_today_only=False, days_offset=days_offset_int)
+                    title = f"{abs(days_offset_int)}日前のパフォーマンスレポート"
+                await ctx.send(f'📅 {title}を生成中...')
+                lines = iter_performance_report_lines(use_today_only=False, days_offset=days_offset_int)
             else:
+                title = "今日のパフォーマンスレポート"
                 await ctx.send('📅 今日のパフォーマンスレポートを生成中...')
-                report = get_performance_report(use_today_only=True)
-            
-            # 長いレポートは分割
-            if len(report) > 2000:
-                if days_offset_int is not None:
-                    if days_offset_int == -1:
-                        title = "前日のパフォーマンスレポート"
-                    elif days_offset_int == -2:
-                        title = "2日前のパフォーマンスレポート"
-                    else:
-                        title = f"{abs(days_offset_int)}日前のパフォーマンスレポート"
-                else:
-                    title = "今日のパフォーマンスレポート"
-                
-                chunks = [report[i:i+1900] for i in range(0, len(report), 1900)]
-                for i, chunk in enumerate(chunks):
-                    await ctx.send(f"{title} (Part {i+1}/{len(chunks)}):\n{chunk}")
-            else:
-                await ctx.send(report)
+                lines = iter_performance_report_lines(use_today_only=True)
+
+            # 全文を構築せず、行を逐次バッファリングして分割送信
+            await send_chunked(ctx, lines, title)
         except Exception as e:
             error_msg = f'❌ パフォーマンスレポート取得エラー: {e}'
             await ctx.send(error_msg)
@@ -2221,16 +2661,10 @@ if DISCORD_BOT_TOKEN:
     async def show_schedule(ctx):
         """trades.csvのエントリー一覧を表示"""
         try:
-            schedule_display = get_trades_schedule_for_display()
-            
-            # Discordのメッセージ制限（2000文字）を考慮して分割送信
-            if len(schedule_display) > 1900:
-                chunks = [schedule_display[i:i+1900] for i in range(0, len(schedule_display), 1900)]
-                for i, chunk in enumerate(chunks):
-                    await ctx.send(f"取引スケジュール (Part {i+1}/{len(chunks)}):\n{chunk}")
-            else:
-                await ctx.send(schedule_display)
-                
+            # 全文を構築せず、行を逐次バッファリングして分割送信
+            await send_chunked(ctx, iter_trades_schedule_lines(), "取引スケジュール")
+
+
         except Exception as e:
             await ctx.send(f'❌ スケジュール取得中にエラーが発生しました: {e}')
             logging.error(f"スケジュール表示エラー: {e}")
@@ -2238,42 +2672,45 @@ if DISCORD_BOT_TOKEN:
     @bot.command(name='command')
     async def command_list(ctx):
         """コマンド一覧を表示（詳細版）"""
-        commands_msg = "📋 **利用可能なコマンド（詳細版）**\n\n"
-        commands_msg += "**基本コマンド**\n"
-        commands_msg += "`kill` - 全ポジションを即座に決済（緊急時）\n"
-        commands_msg += "`stop` - ボットを停止\n"
-        commands_msg += "`restart` - ボットを再起動\n"
-        commands_msg += "`position` - 現在のポジションを表示\n"
-        commands_msg += "`status` - システムステータスを表示（詳細版）\n"
-        commands_msg += "`health` - ヘルスチェックを実行（詳細版）\n"
-        commands_msg += "`performance [日数]` - パフォーマンスレポートを表示\n"
-        commands_msg += "`all` - 全情報を表示\n"
-        commands_msg += "`schedule` - 取引スケジュールを表示\n\n"
-        commands_msg += "**管理コマンド**\n"
-        commands_msg += "`backup` - 手動バックアップを実行（詳細版）\n"
-        commands_msg += "`memory` - メモリ使用量を表示\n"
-        commands_msg += "`cleanup` - メモリクリーンアップを実行\n"
-        commands_msg += "`reload` - 設定を再読み込み\n"
-        commands_msg += "`testlot [通貨ペア] [売買方向]` - ロット計算テスト\n"
-        commands_msg += "`debuglot [通貨ペア] [売買方向]` - ロット計算デバッグ\n"
-        commands_msg += "`command` - このコマンド一覧を表示\n\n"
-        commands_msg += "**新機能**\n"
-        commands_msg += "• 詳細な自動ロット計算（通貨ペア別）\n"
-        commands_msg += "• API手数料管理と追跡\n"
-        commands_msg += "• 銘柄別取引数量制限\n"
-        commands_msg += "• 詳細なスプレッド管理\n"
-        commands_msg += "• 重複建玉防止機能\n"
-        commands_msg += "• 未認識ポジション処理\n"
-        commands_msg += "• 詳細なログ管理（ローテーション付き）\n"
-        commands_msg += "• 詳細なメモリ管理とクリーンアップ\n"
-        commands_msg += "• 動的レート制限調整\n"
-        commands_msg += "• 詳細なバックアップと整合性チェック\n"
-        commands_msg += "• 詳細なヘルスチェック\n\n"
-        commands_msg += "**例**\n"
-        commands_msg += "`performance 7` - 過去7日間のパフォーマンス\n"
-        commands_msg += "`testlot EUR_JPY SELL` - EUR/JPY売りのロット計算テスト\n"
-        commands_msg += "`memory` - メモリ使用量の詳細表示"
-        
+        # 静的な一覧なので単一のリテラルとして保持する
+        commands_msg = (
+            "📋 **利用可能なコマンド（詳細版）**\n\n"
+            "**基本コマンド**\n"
+            "`kill` - 全ポジションを即座に決済（緊急時）\n"
+            "`stop` - ボットを停止\n"
+            "`restart` - ボットを再起動\n"
+            "`position` - 現在のポジションを表示\n"
+            "`status` - システムステータスを表示（詳細版）\n"
+            "`health` - ヘルスチェックを実行（詳細版）\n"
+            "`performance [日数]` - パフォーマンスレポートを表示\n"
+            "`all` - 全情報を表示\n"
+            "`schedule` - 取引スケジュールを表示\n\n"
+            "**管理コマンド**\n"
+            "`backup` - 手動バックアップを実行（詳細版）\n"
+            "`memory` - メモリ使用量を表示\n"
+            "`cleanup` - メモリクリーンアップを実行\n"
+            "`reload` - 設定を再読み込み\n"
+            "`testlot [通貨ペア] [売買方向]` - ロット計算テスト\n"
+            "`debuglot [通貨ペア] [売買方向]` - ロット計算デバッグ\n"
+            "`command` - このコマンド一覧を表示\n\n"
+            "**新機能**\n"
+            "• 詳細な自動ロット計算（通貨ペア別）\n"
+            "• API手数料管理と追跡\n"
+            "• 銘柄別取引数量制限\n"
+            "• 詳細なスプレッド管理\n"
+            "• 重複建玉防止機能\n"
+            "• 未認識ポジション処理\n"
+            "• 詳細なログ管理（ローテーション付き）\n"
+            "• 詳細なメモリ管理とクリーンアップ\n"
+            "• 動的レート制限調整\n"
+            "• 詳細なバックアップと整合性チェック\n"
+            "• 詳細なヘルスチェック\n\n"
+            "**例**\n"
+            "`performance 7` - 過去7日間のパフォーマンス\n"
+            "`testlot EUR_JPY SELL` - EUR/JPY売りのロット計算テスト\n"
+            "`memory` - メモリ使用量の詳細表示"
+        )
+
         await ctx.send(commands_msg)
 
     def run_bot():
@@ -2287,26 +2724,31 @@ if DISCORD_BOT_TOKEN:
 # ===============================
 # システム管理・分析関数
 # ===============================
+# (レスポンスキー, 売買方向, positionId接尾辞)の対応表
+_POSITION_SIDES = (("long", "BUY", "-long"), ("short", "SELL", "-short"))
+
 def get_all_positions():
     """全ポジションを取得"""
     try:
         # OANDAレート制限チェック
         oanda_rate_limit()
-        
+
         r = positions.OpenPositions(OANDA_ACCOUNT_ID)
         resp = oanda_api.request(r)
-        
+
         positions_list = []
         for p in resp["positions"]:
-            for side in ["long", "short"]:
-                units = float(p[side]["units"])
-                if abs(units) > 0:
+            instrument = p["instrument"]
+            for key, side_str, suffix in _POSITION_SIDES:
+                side_data = p[key]
+                units = float(side_data["units"])
+                if units:
                     positions_list.append({
-                        "symbol": p["instrument"],
-                        "side": "BUY" if side == "long" else "SELL",
-                        "positionId": f"{p['instrument']}-{side}",
+                        "symbol": instrument,
+                        "side": side_str,
+                        "positionId": instrument + suffix,
                         "size": abs(units),
-                        "price": float(p[side]["averagePrice"])
+                        "price": float(side_data["averagePrice"])
                     })
         return positions_list
     except Exception as e:
@@ -2323,12 +2765,18 @@ def close_position_by_info(position, exit_time, auto_closed=False, trade_index=N
     average_exit_price = broker.close_position(
         position.symbol, position.position_id, position.size, exit_side
     )
+    invalidate_balance_cache()  # 決済で残高が変わるためキャッシュを破棄
+    invalidate_positions_cache()
     profit_pips = calculate_profit_pips(
         float(position.price), average_exit_price, position.side, position.symbol
     )
     profit_amount = calculate_profit_amount(
         float(position.price), average_exit_price, position.side, position.symbol, position.size
     )
+    # 現在時刻は一度だけ取得して使い回す
+    now = datetime.now()
+    now_hms = now.strftime('%H:%M:%S')
+    today = now.date()
     trade_results.append({
         "symbol": position.symbol,
         "side": position.side,
@@ -2337,14 +2785,16 @@ def close_position_by_info(position, exit_time, auto_closed=False, trade_index=N
         "profit_pips": profit_pips,
         "profit_amount": profit_amount,
         "lot_size": position.size,
-        "entry_time": getattr(position, 'entry_time', datetime.now().strftime('%H:%M:%S')),
-        "exit_time": datetime.now().strftime('%H:%M:%S'),
-        "entry_date": getattr(position, 'entry_date', datetime.now().date()),
-        "exit_date": datetime.now().date(),
+        "entry_time": getattr(position, 'entry_time', now_hms),
+        "exit_time": now_hms,
+        "entry_date": getattr(position, 'entry_date', today),
+        "exit_date": today,
+        "_exit_dt": now,  # 解析済み決済時刻（日次確定処理での再解析を省く）
     })
+    record_daily_stats(trade_results[-1])
     close_type = "自動決済" if auto_closed else "予定決済"
-    # 証拠金残高取得
-    balance_data = broker.get_balance()
+    # 証拠金残高取得（短TTLキャッシュ経由）
+    balance_data = get_balance_cached()
     data = balance_data.get('data')
     if isinstance(data, list) and len(data) > 0:
         balance_amount = float(data[0].get('balance', 0))
@@ -2352,38 +2802,74 @@ def close_position_by_info(position, exit_time, auto_closed=False, trade_index=N
         balance_amount = float(data.get('balance', 0))
     else:
         balance_amount = 0
-    send_discord_message(
-        f"{close_type}しました: 通貨ペア={position.symbol}, 売買方向={position.side}, "
-        f"エントリー価格={position.price}, 決済価格={average_exit_price}, 損益pips={profit_pips} ({profit_amount}円), ロット数={position.size} "
-        f"(決済時間: {datetime.now().strftime('%H:%M:%S')})\n"
-        f"現在の証拠金残高: {balance_amount}円"
-    )
-    print(f"【決済完了】{close_type}: {position.symbol} {position.side} {position.price}→{average_exit_price} {profit_pips}pips ({profit_amount}円) ロット数:{position.size}")
+    _emit_close_event({
+        'close_type': close_type,
+        'symbol': position.symbol,
+        'side': position.side,
+        'entry_price': position.price,
+        'exit_price': average_exit_price,
+        'profit_pips': profit_pips,
+        'profit_amount': profit_amount,
+        'lot_size': position.size,
+        'exit_time': now_hms,
+        'balance_amount': balance_amount,
+    })
     return profit_pips
 
+# 通貨ペアごとの未認識ポジション監視イベント（cancel_position_checkで即時解除）
+_position_check_events = {}
+_position_check_events_lock = Lock()
+
+def cancel_position_check(symbol):
+    """対象通貨ペアの未認識ポジション監視を即時解除する"""
+    with _position_check_events_lock:
+        event = _position_check_events.get(symbol)
+    if event is not None:
+        event.set()
+
 def schedule_position_check(symbol, expected_close_time):
     """
     エントリー失敗後も定期的にポジションを確認し、あれば決済する
+    cancel_position_check(symbol)で外部から即時解除できる
     """
-    end_time = expected_close_time + timedelta(minutes=10)
-    while datetime.now() < end_time:
-        positions = check_current_positions(symbol)
-        if positions:
-            logging.warning(f"未認識のポジションが見つかりました。決済を実行します: {positions}")
-            for position in positions:
-                exit_side = "SELL" if position.side == "BUY" else "BUY"
-                try:
-                    broker.close_position(position.symbol, position.position_id, position.size, exit_side)
-                    send_discord_message(f"⚠️ 未認識ポジションを検出し決済しました: {position.symbol} {position.side}")
-                except Exception as e:
-                    logging.error(f"未認識ポジション決済中のエラー: {e}")
-            return True
-        # 次の確認まで待機
-        time.sleep(POSITION_CHECK_INTERVAL)
-    return False
+    event = threading.Event()
+    with _position_check_events_lock:
+        _position_check_events[symbol] = event
+    # 残り監視時間はmonotonicで計る（時刻変更・DSTの影響を受けない）
+    deadline = time.monotonic() + max(
+        0.0, (expected_close_time + timedelta(minutes=10) - datetime.now()).total_seconds())
+    check_interval = POSITION_CHECK_INTERVAL
+    try:
+        while time.monotonic() < deadline:
+            positions = check_current_positions(symbol)
+            if positions:
+                logging.warning(f"未認識のポジションが見つかりました。決済を実行します: {positions}")
+                for position in positions:
+                    exit_side = "SELL" if position.side == "BUY" else "BUY"
+                    try:
+                        broker.close_position(position.symbol, position.position_id, position.size, exit_side)
+                        send_discord_message_async(f"⚠️ 未認識ポジションを検出し決済しました: {position.symbol} {position.side}")
+                    except Exception as e:
+                        logging.error(f"未認識ポジション決済中のエラー: {e}")
+                return True
+            # ポジションが見つからない間は確認間隔を指数的に延ばす（最大60秒）
+            # jitterを加えて確認タイミングの同期を避ける
+            # イベントがsetされたら待機を打ち切って即終了する
+            if event.wait(check_interval * (0.8 + 0.4 * random.random())):
+                break
+            check_interval = min(check_interval * 1.5, 60)
+        return False
+    finally:
+        with _position_check_events_lock:
+            if _position_check_events.get(symbol) is event:
+                del _position_check_events[symbol]
 
-def health_check():
-    """システムヘルスチェック（詳細版）"""
+def health_check(snapshot=None):
+    """
+    システムヘルスチェック（詳細版・独立プローブを並列実行）
+    snapshotに_sample_system_metrics()の結果を渡すと、メモリ・ディスクの
+    再採取を省略して呼び出し元と測定値を共有する
+    """
     try:
         health_status = {
             'api_connection': False,
@@ -2393,54 +2879,50 @@ def health_check():
             'file_access': False,
             'overall_health': False
         }
-        
-        # API接続チェック
-        try:
-            balance_data = broker.get_balance()
+
+        def _probe_api():
+            """API接続チェック"""
+            balance_data = get_balance_cached()
             if balance_data and 'data' in balance_data:
-                health_status['api_connection'] = True
                 logging.info("API接続: 正常")
-            else:
-                logging.warning("API接続: 異常")
-        except Exception as e:
-            logging.error(f"API接続チェックエラー: {e}")
-        
-        # Discord接続チェック
-        try:
+                return True
+            logging.warning("API接続: 異常")
+            return False
+
+        def _probe_discord():
+            """Discord接続チェック"""
             if DISCORD_WEBHOOK_URL:
                 # テストメッセージを送信（実際には送信しない）
-                health_status['discord_connection'] = True
                 logging.info("Discord接続: 正常")
-            else:
-                logging.warning("Discord接続: Webhook URL未設定")
-        except Exception as e:
-            logging.error(f"Discord接続チェックエラー: {e}")
-        
-        # メモリ使用量チェック
-        try:
-            memory_usage = get_memory_usage()
-            if memory_usage['rss'] < 500:  # 500MB以下
-                health_status['memory_usage'] = True
-                logging.info(f"メモリ使用量: 正常 ({memory_usage['rss']:.1f}MB)")
-            else:
-                logging.warning(f"メモリ使用量: 高すぎる ({memory_usage['rss']:.1f}MB)")
-        except Exception as e:
-            logging.error(f"メモリ使用量チェックエラー: {e}")
-        
-        # ディスク容量チェック
-        try:
-            disk_usage = psutil.disk_usage('.')
+                return True
+            logging.warning("Discord接続: Webhook URL未設定")
+            return False
+
+        def _probe_memory():
+            """メモリ使用量チェック（Pythonヒープ実測値で判定）"""
+            # RSSは共有ライブラリ分を含むため、一次判定はtracemallocの
+            # ヒープ割り当て量で行い、RSSはOSレベルの逼迫検知に使う
+            py_mb = tracemalloc.get_traced_memory()[0] / 1024 / 1024
+            memory_usage = snapshot['memory'] if snapshot else get_memory_usage()
+            rss_mb = memory_usage['rss']
+            if py_mb < 400 and rss_mb < 500:
+                logging.info("メモリ使用量: 正常 (ヒープ%.1fMB / RSS%.1fMB)", py_mb, rss_mb)
+                return True
+            logging.warning("メモリ使用量: 高すぎる (ヒープ%.1fMB / RSS%.1fMB)", py_mb, rss_mb)
+            return False
+
+        def _probe_disk():
+            """ディスク容量チェック"""
+            disk_usage = snapshot['disk'] if snapshot else psutil.disk_usage('.')
             free_gb = disk_usage.free / (1024**3)
             if free_gb > 1:  # 1GB以上
-                health_status['disk_space'] = True
-                logging.info(f"ディスク容量: 正常 ({free_gb:.1f}GB 空き)")
-            else:
-                logging.warning(f"ディスク容量: 不足 ({free_gb:.1f}GB 空き)")
-        except Exception as e:
-            logging.error(f"ディスク容量チェックエラー: {e}")
-        
-        # ファイルアクセスチェック
-        try:
+                logging.info("ディスク容量: 正常 (%.1fGB 空き)", free_gb)
+                return True
+            logging.warning("ディスク容量: 不足 (%.1fGB 空き)", free_gb)
+            return False
+
+        def _probe_file():
+            """ファイルアクセスチェック"""
             # 重要なファイルのアクセス権限をチェック
             important_files = [CONFIG_FILE, SCHEDULE_CSV]
             for file_path in important_files:
@@ -2449,36 +2931,52 @@ def health_check():
                     if not os.access(file_path, os.R_OK):
                         raise Exception(f"ファイル読み取り権限なし: {file_path}")
                 else:
-                    logging.warning(f"ファイルが存在しません: {file_path}")
-            
+                    logging.warning("ファイルが存在しません: %s", file_path)
+
             # ログディレクトリの書き込み権限チェック
             if not os.access('logs', os.W_OK):
                 raise Exception("ログディレクトリの書き込み権限なし")
-            
-            health_status['file_access'] = True
+
             logging.info("ファイルアクセス: 正常")
-        except Exception as e:
-            logging.error(f"ファイルアクセスチェックエラー: {e}")
-        
-        # 総合判定
-        health_status['overall_health'] = all([
-            health_status['api_connection'],
-            health_status['discord_connection'],
-            health_status['memory_usage'],
-            health_status['disk_space'],
-            health_status['file_access']
-        ])
+            return True
+
+        probes = {
+            'api_connection': _probe_api,
+            'discord_connection': _probe_discord,
+            'memory_usage': _probe_memory,
+            'disk_space': _probe_disk,
+            'file_access': _probe_file,
+        }
+
+        # 各プローブは独立しているため並列実行する
+        # （API残高照会が支配的なので、全体時間は最遅プローブ程度になる）
+        with ThreadPoolExecutor(max_workers=len(probes)) as executor:
+            futures = {key: executor.submit(probe) for key, probe in probes.items()}
+            for key, future in futures.items():
+                try:
+                    health_status[key] = bool(future.result())
+                except Exception as e:
+                    logging.error("ヘルスチェックプローブエラー (%s): %s", key, e)
+
+        # 総合判定（最初のFalseで短絡評価し、リストも作らない）
+        health_status['overall_health'] = (
+            health_status['api_connection']
+            and health_status['discord_connection']
+            and health_status['memory_usage']
+            and health_status['disk_space']
+            and health_status['file_access']
+        )
         
         # ヘルスチェック結果をログ出力
         if health_status['overall_health']:
             logging.info("ヘルスチェック: 全項目正常")
         else:
             failed_items = [k for k, v in health_status.items() if not v and k != 'overall_health']
-            logging.warning(f"ヘルスチェック: 異常項目あり - {failed_items}")
+            logging.warning("ヘルスチェック: 異常項目あり - %s", failed_items)
         
         return health_status
     except Exception as e:
-        logging.error(f"ヘルスチェックエラー: {e}")
+        logging.error("ヘルスチェックエラー: %s", e)
         return {'overall_health': False}
 
 def get_system_status():
@@ -2490,24 +2988,21 @@ def get_system_status():
         minutes = int((uptime_seconds % 3600) // 60)
         uptime_str = f"{hours}時間{minutes}分"
         
-        # メモリ使用量
-        memory_usage = get_memory_usage()
-        
-        # ディスク使用量
-        disk_usage = psutil.disk_usage('.')
-        disk_free_gb = disk_usage.free / (1024**3)
-        
-        # 今日の取引数
-        today_trades = len([t for t in trade_results if t.get('exit_date') == datetime.now().date()])
+        # システムメトリクスを一度だけ採取し、ヘルスチェックと共有する
+        snapshot = _sample_system_metrics()
+        memory_usage = snapshot['memory']
+        disk_free_gb = snapshot['disk'].free / (1024**3)
         
-        # 今日の損益
-        today_pnl = sum([t.get('profit_amount', 0) for t in trade_results if t.get('exit_date') == datetime.now().date()])
+        # 今日の取引数・損益（日次集計からO(1)で参照）
+        today_stats = daily_stats[datetime.now().date()]
+        today_trades = today_stats['trades']
+        today_pnl = today_stats['profit_amount']
         
         # レート制限状態
         rate_limit_status = get_oanda_rate_limit_status()
         
-        # ヘルスチェック
-        health_status = health_check()
+        # ヘルスチェック（採取済みメトリクスを渡して再測定を省く）
+        health_status = health_check(snapshot=snapshot)
         
         return {
             'uptime': uptime_str,
@@ -2528,158 +3023,189 @@ def get_system_status():
         logging.error(f"システムステータス取得エラー: {e}")
         return {}
 
-def get_performance_report(use_today_only=False, days_offset=None):
-    """パフォーマンスレポートを生成"""
+def iter_performance_report_lines(use_today_only=False, days_offset=None):
+    """パフォーマンスレポートを行単位で遅延生成する"""
     try:
         # collect_metrics関数を使用して詳細なメトリクスを取得
         metrics = collect_metrics(use_today_only, days_offset)
-        
+
         if not metrics:
-            return "📊 指定期間の取引データがありません。"
-        
+            yield "📊 指定期間の取引データがありません。"
+            return
+
         # 詳細なレポートを生成
-        report = f"📊 **{metrics['period']}のパフォーマンスレポート**\n\n"
-        report += f"**基本統計**\n"
-        report += f"取引回数: {metrics['total_trades']}回\n"
-        report += f"勝率: {metrics['win_rate']:.1f}%\n"
-        report += f"勝ち取引: {metrics['winning_trades']}回\n"
-        report += f"負け取引: {metrics['losing_trades']}回\n\n"
-        
-        report += f"**損益統計**\n"
-        report += f"総損益pips: {metrics['total_profit_pips']:.1f}\n"
-        report += f"総損益金額: {metrics['total_profit_amount']:.0f}円\n"
-        report += f"平均損益pips: {metrics['average_profit_pips']:.1f}\n"
-        report += f"平均損益金額: {metrics['average_profit_amount']:.0f}円\n\n"
-        
-        report += f"**最大値・最小値**\n"
-        report += f"最大利益: {metrics['max_profit']:.0f}円\n"
-        report += f"最大損失: {metrics['max_loss']:.0f}円\n"
-        report += f"最大ドローダウン: {metrics['max_drawdown_amount']:.0f}円\n\n"
-        
-        report += f"**パフォーマンス指標**\n"
-        report += f"シャープレシオ: {metrics['sharpe_ratio']:.2f}\n"
-        report += f"API呼び出し回数: {metrics['api_calls']}回\n"
-        report += f"APIエラー回数: {metrics['api_errors']}回\n"
-        report += f"累計API手数料: {metrics['total_api_fee']:.0f}円"
-        
-        return report
-        
+        yield f"📊 **{metrics['period']}のパフォーマンスレポート**\n\n"
+        yield f"**基本統計**\n"
+        yield f"取引回数: {metrics['total_trades']}回\n"
+        yield f"勝率: {metrics['win_rate']:.1f}%\n"
+        yield f"勝ち取引: {metrics['winning_trades']}回\n"
+        yield f"負け取引: {metrics['losing_trades']}回\n\n"
+
+        yield f"**損益統計**\n"
+        yield f"総損益pips: {metrics['total_profit_pips']:.1f}\n"
+        yield f"総損益金額: {metrics['total_profit_amount']:.0f}円\n"
+        yield f"平均損益pips: {metrics['average_profit_pips']:.1f}\n"
+        yield f"平均損益金額: {metrics['average_profit_amount']:.0f}円\n\n"
+
+        yield f"**最大値・最小値**\n"
+        yield f"最大利益: {metrics['max_profit']:.0f}円\n"
+        yield f"最大損失: {metrics['max_loss']:.0f}円\n"
+        yield f"最大ドローダウン: {metrics['max_drawdown_amount']:.0f}円\n\n"
+
+        yield f"**パフォーマンス指標**\n"
+        yield f"シャープレシオ: {metrics['sharpe_ratio']:.2f}\n"
+        yield f"API呼び出し回数: {metrics['api_calls']}回\n"
+        yield f"APIエラー回数: {metrics['api_errors']}回\n"
+        yield f"累計API手数料: {metrics['total_api_fee']:.0f}円"
+
     except Exception as e:
         logging.error(f"パフォーマンスレポート生成エラー: {e}")
-        return f"❌ パフォーマンスレポート生成エラー: {e}"
+        yield f"❌ パフォーマンスレポート生成エラー: {e}"
+
+def get_performance_report(use_today_only=False, days_offset=None):
+    """パフォーマンスレポートを生成"""
+    return "".join(iter_performance_report_lines(use_today_only, days_offset))
+
+def _dump_json_for_backup(obj):
+    """バックアップ用にJSONへシリアライズ（orjsonがあれば高速・bytesを返す）"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2, default=str)
+    return json.dumps(obj, indent=2, ensure_ascii=False, default=str)
 
 def backup_config_and_data():
-    """設定とデータのバックアップ（詳細版）"""
+    """設定とデータのバックアップ（zip圧縮版）"""
     try:
         backup_dir = "backups"
         if not os.path.exists(backup_dir):
             os.makedirs(backup_dir)
-        
+
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_path = os.path.join(backup_dir, f"backup_{timestamp}")
-        os.makedirs(backup_path)
-        
-        # 設定ファイルのバックアップ
-        if os.path.exists(CONFIG_FILE):
-            import shutil
-            shutil.copy2(CONFIG_FILE, os.path.join(backup_path, "config.json"))
-            logging.info(f"設定ファイルをバックアップ: {CONFIG_FILE}")
-        
-        # 取引結果のバックアップ
-        if trade_results:
-            with open(os.path.join(backup_path, "trade_results.json"), 'w', encoding='utf-8') as f:
-                json.dump(trade_results, f, indent=2, ensure_ascii=False, default=str)
-            logging.info(f"取引結果をバックアップ: {len(trade_results)}件")
-        
-        # 手数料履歴のバックアップ
-        if fee_records:
-            with open(os.path.join(backup_path, "fee_records.json"), 'w', encoding='utf-8') as f:
-                json.dump(fee_records, f, indent=2, ensure_ascii=False, default=str)
-            logging.info(f"手数料履歴をバックアップ: {len(fee_records)}件")
-        
-        # 銘柄別取引数量のバックアップ
-        if symbol_daily_volume:
-            with open(os.path.join(backup_path, "symbol_daily_volume.json"), 'w', encoding='utf-8') as f:
-                json.dump(symbol_daily_volume, f, indent=2, ensure_ascii=False)
-            logging.info(f"銘柄別取引数量をバックアップ: {len(symbol_daily_volume)}銘柄")
-        
-        # ログファイルのバックアップ
-        if os.path.exists('logs'):
-            import shutil
-            shutil.copytree('logs', os.path.join(backup_path, "logs"))
-            logging.info("ログファイルをバックアップ")
-        
-        # 取引スケジュールファイルのバックアップ
-        if os.path.exists(SCHEDULE_CSV):
-            import shutil
-            shutil.copy2(SCHEDULE_CSV, os.path.join(backup_path, "trades.csv"))
-            logging.info(f"取引スケジュールをバックアップ: {SCHEDULE_CSV}")
-        
-        # バックアップの整合性チェック
-        backup_size = sum(os.path.getsize(os.path.join(backup_path, f)) for f in os.listdir(backup_path) if os.path.isfile(os.path.join(backup_path, f)))
-        logging.info(f"バックアップサイズ: {backup_size / 1024:.1f}KB")
+        backup_path = os.path.join(backup_dir, f"backup_{timestamp}.zip")
+
+        # 中間ディレクトリを作らず、1つのzipへ直接ストリーム書き込みする
+        with zipfile.ZipFile(backup_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=6) as zf:
+            # 設定ファイルのバックアップ
+            if os.path.exists(CONFIG_FILE):
+                zf.write(CONFIG_FILE, "config.json")
+                logging.info("設定ファイルをバックアップ: %s", CONFIG_FILE)
+
+            # 取引結果のバックアップ
+            if trade_results:
+                zf.writestr("trade_results.json", _dump_json_for_backup(list(trade_results)))
+                logging.info("取引結果をバックアップ: %d件", len(trade_results))
+
+            # 手数料履歴のバックアップ
+            if fee_records:
+                zf.writestr("fee_records.json", _dump_json_for_backup(fee_records))
+                logging.info("手数料履歴をバックアップ: %d件", len(fee_records))
+
+            # 銘柄別取引数量のバックアップ
+            if symbol_daily_volume:
+                zf.writestr("symbol_daily_volume.json", _dump_json_for_backup(symbol_daily_volume))
+                logging.info("銘柄別取引数量をバックアップ: %d銘柄", len(symbol_daily_volume))
+
+            # ログファイルのバックアップ
+            if os.path.exists('logs'):
+                for root, dirs, files in os.walk('logs'):
+                    for file in files:
+                        file_path = os.path.join(root, file)
+                        zf.write(file_path, os.path.relpath(file_path))
+                logging.info("ログファイルをバックアップ")
+
+            # 取引スケジュールファイルのバックアップ
+            if os.path.exists(SCHEDULE_CSV):
+                zf.write(SCHEDULE_CSV, "trades.csv")
+                logging.info("取引スケジュールをバックアップ: %s", SCHEDULE_CSV)
+
+            # バックアップの整合性チェック（展開後サイズ）
+            backup_size = sum(info.file_size for info in zf.infolist())
+            logging.info("バックアップサイズ: %.1fKB", backup_size / 1024)
         
         # 古いバックアップの自動削除
         cleanup_old_backups(backup_dir, days=30)
         
-        logging.info(f"バックアップ完了: {backup_path}")
+        logging.info("バックアップ完了: %s", backup_path)
         return backup_path
     except Exception as e:
-        logging.error(f"バックアップエラー: {e}")
+        logging.error("バックアップエラー: %s", e)
         return None
 
+# バックアップ名（zip形式と旧ディレクトリ形式の両方にマッチ）
+_BACKUP_NAME_RE = re.compile(r'^backup_(\d{8}_\d{6})(\.zip)?$')
+
 def cleanup_old_backups(backup_dir, days=30):
     """古いバックアップを自動削除"""
     try:
-        cutoff_date = datetime.now() - timedelta(days=days)
+        # タイムスタンプはゼロ埋め固定長なので、datetimeへ変換せず
+        # 文字列の辞書順比較でカットオフ判定できる
+        cutoff_key = (datetime.now() - timedelta(days=days)).strftime("%Y%m%d_%H%M%S")
         deleted_count = 0
-        
+
         for item in os.listdir(backup_dir):
+            match = _BACKUP_NAME_RE.match(item)
+            if not match or match.group(1) >= cutoff_key:
+                continue
             item_path = os.path.join(backup_dir, item)
-            if os.path.isdir(item_path) and item.startswith("backup_"):
-                try:
-                    # バックアップディレクトリ名から日時を抽出
-                    timestamp_str = item.replace("backup_", "")
-                    backup_date = datetime.strptime(timestamp_str, "%Y%m%d_%H%M%S")
-                    
-                    if backup_date < cutoff_date:
-                        import shutil
-                        shutil.rmtree(item_path)
-                        logging.info(f"古いバックアップを削除: {item}")
-                        deleted_count += 1
-                except Exception as e:
-                    logging.warning(f"バックアップ削除エラー ({item}): {e}")
+            try:
+                if os.path.isdir(item_path):
+                    shutil.rmtree(item_path)
+                else:
+                    os.remove(item_path)
+                logging.info("古いバックアップを削除: %s", item)
+                deleted_count += 1
+            except Exception as e:
+                logging.warning("バックアップ削除エラー (%s): %s", item, e)
         
         if deleted_count > 0:
-            logging.info(f"{deleted_count}個の古いバックアップを削除しました")
+            logging.info("%d個の古いバックアップを削除しました", deleted_count)
             
     except Exception as e:
-        logging.error(f"バックアップクリーンアップエラー: {e}")
+        logging.error("バックアップクリーンアップエラー: %s", e)
+
+def _dir_size_scandir(path):
+    """
+    ディレクトリ配下の合計サイズをos.scandirで再帰的に求める
+    DirEntryがstat結果をキャッシュするため、os.walk+getsizeのように
+    ファイルごとに追加のstatシステムコールを発行しない
+    """
+    total = 0
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                total += _dir_size_scandir(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                total += entry.stat(follow_symlinks=False).st_size
+    return total
 
 def verify_backup(backup_path):
-    """バックアップの整合性を検証"""
+    """バックアップの整合性を検証（zip形式と旧ディレクトリ形式の両方に対応）"""
     try:
         if not os.path.exists(backup_path):
-            return False, "バックアップディレクトリが存在しません"
-        
-        # 必須ファイルの存在チェック
-        required_files = ["config.json"]
-        for file in required_files:
-            if not os.path.exists(os.path.join(backup_path, file)):
-                return False, f"必須ファイルが存在しません: {file}"
-        
-        # ファイルサイズチェック
-        total_size = 0
-        for root, dirs, files in os.walk(backup_path):
-            for file in files:
-                file_path = os.path.join(root, file)
-                total_size += os.path.getsize(file_path)
-        
+            return False, "バックアップが存在しません"
+
+        # zip形式のバックアップ
+        if zipfile.is_zipfile(backup_path):
+            with zipfile.ZipFile(backup_path) as zf:
+                names = set(zf.namelist())
+                required_files = ["config.json"]
+                for file in required_files:
+                    if file not in names:
+                        return False, f"必須ファイルが存在しません: {file}"
+                total_size = sum(info.file_size for info in zf.infolist())
+        else:
+            # 旧ディレクトリ形式のバックアップ
+            required_files = ["config.json"]
+            for file in required_files:
+                if not os.path.exists(os.path.join(backup_path, file)):
+                    return False, f"必須ファイルが存在しません: {file}"
+
+            total_size = _dir_size_scandir(backup_path)
+
         if total_size == 0:
             return False, "バックアップサイズが0です"
-        
+
         return True, f"バックアップ検証成功: {total_size / 1024:.1f}KB"
-        
+
     except Exception as e:
         return False, f"バックアップ検証エラー: {e}"
 
@@ -2688,8 +3214,8 @@ def test_auto_lot_debug():
     try:
         debug_info = {}
         
-        # 残高取得
-        balance_data = broker.get_balance()
+        # 残高取得（短TTLキャッシュ経由）
+        balance_data = get_balance_cached()
         if balance_data and 'data' in balance_data:
             balance = float(balance_data['data'][0]['balance'])
             debug_info['balance'] = balance
@@ -2703,14 +3229,18 @@ def test_auto_lot_debug():
         # リスク設定
         debug_info['risk_ratio'] = config.get('risk_ratio', 0.02)
         
-        # テスト用のロット計算
+        # テスト用のロット計算（価格取得がAPI待ちになるため通貨ペアごとに並列実行）
         test_symbols = ["USD_JPY", "EUR_JPY", "GBP_JPY"]
-        for symbol in test_symbols:
-            try:
-                lot_size = calc_auto_lot_gmobot2(balance, symbol, "BUY", LEVERAGE)
-                debug_info[f"{symbol}_BUY"] = lot_size
-            except Exception as e:
-                debug_info[f"{symbol}_BUY"] = f"エラー: {e}"
+        with ThreadPoolExecutor(max_workers=min(8, len(test_symbols))) as executor:
+            futures = {
+                symbol: executor.submit(calc_auto_lot_gmobot2, balance, symbol, "BUY", LEVERAGE)
+                for symbol in test_symbols
+            }
+            for symbol, future in futures.items():
+                try:
+                    debug_info[f"{symbol}_BUY"] = future.result()
+                except Exception as e:
+                    debug_info[f"{symbol}_BUY"] = f"エラー: {e}"
         
         return debug_info
     except Exception as e:
@@ -2720,101 +3250,277 @@ def test_auto_lot_debug():
 # ===============================
 # 定期position監視機能（main.pyから統合）
 # ===============================
-def load_trades_schedule():
+def _read_trades_rows():
     """
-    trades.csvからエントリー・決済時刻のリストを取得
-    戻り値: [(entry_datetime, exit_datetime), ...]
+    trades.csvを一括read()してカンマ分割済みの行リストを返す（ヘッダーは除外）
+    行ごとのイテレータ駆動よりシステムコールとオブジェクト生成が少ない
     """
-    schedule = []
+    with open(SCHEDULE_CSV, mode='r', encoding='utf-8', buffering=1 << 20) as file:
+        lines = file.read().splitlines()
+    rows = []
+    for line in lines[1:]:  # ヘッダー行をスキップ
+        if not line:
+            continue
+        rows.append(line.split(','))
+    return rows
+
+@functools.lru_cache(maxsize=512)
+def _parse_hms(hms):
+    """'HH:MM:SS'文字列をtimeへ変換（同じ文字列はキャッシュから返す）"""
     try:
-        with open(SCHEDULE_CSV, mode='r', encoding='utf-8') as file:
-            reader = csv.reader(file)
-            header = next(reader)
-            now = datetime.now()
-            for row in reader:
-                if len(row) >= 5 and row[3].strip() and row[4].strip():
-                    try:
-                        entry_time = datetime.strptime(row[3].strip(), '%H:%M:%S').replace(year=now.year, month=now.month, day=now.day)
-                        exit_time = datetime.strptime(row[4].strip(), '%H:%M:%S').replace(year=now.year, month=now.month, day=now.day)
-                        
-                        # 日を跨ぐ取引の場合、現在時刻を考慮して日付を調整
-                        if exit_time <= entry_time:
-                            exit_time += timedelta(days=1)
-                            # 現在時刻が0:00-6:00の範囲で、エントリー時刻も0:00-6:00の場合は前日として扱う
-                            if (now.hour < 6 and entry_time.hour < 6):
-                                entry_time -= timedelta(days=1)
-                                exit_time -= timedelta(days=1)
-                            # さらに、現在時刻が決済時刻を過ぎていない場合も前日として扱う
-                            elif now.hour < exit_time.hour:
-                                entry_time -= timedelta(days=1)
-                                exit_time -= timedelta(days=1)
-                        
-                        schedule.append((entry_time, exit_time))
-                    except Exception:
-                        continue
+        # スライス＋intの直接変換はstrptimeより数倍速い（初回ミス時のコスト削減）
+        return dtime(int(hms[0:2]), int(hms[3:5]), int(hms[6:8]))
+    except ValueError:
+        # 'H:MM'など桁数が揃わない形式はstrptime相当の従来処理へフォールバック
+        return datetime.strptime(hms, '%H:%M:%S').time()
+
+# 解析済みスケジュールのキャッシュ
+# 日跨ぎ補正がnow.hourに依存するため、(mtime, 日付, 時)をキーにする
+_schedule_cache = {}
+_schedule_cache_lock = Lock()
+
+def load_trades_schedule():
+    """
+    trades.csvからエントリー・決済時刻のリストを取得
+    戻り値: [(entry_epoch_ns, exit_epoch_ns), ...]（日跨ぎ補正済みのint64ナノ秒）
+    ファイル更新・日付・時間帯が変わらない限り、解析済みの結果を再利用する
+    """
+    try:
+        stat = os.stat(SCHEDULE_CSV)
+        now_key = datetime.now()
+        cache_key = (stat.st_mtime_ns, now_key.date(), now_key.hour)
+    except OSError:
+        cache_key = None
+    if cache_key is not None:
+        with _schedule_cache_lock:
+            cached = _schedule_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    schedule = []
+    try:
+        now = datetime.now()
+        today = now.date()
+        for row in _read_trades_rows():
+            if len(row) < 5:
+                continue
+            # 各フィールドのstripは1回だけ行う
+            entry_str = row[3].strip()
+            exit_str = row[4].strip()
+            if entry_str and exit_str:
+                try:
+                    # 時刻文字列はファイル再読込のたびに繰り返し現れるため
+                    # strptimeはLRUキャッシュ越しに1回だけ実行する
+                    entry_time = datetime.combine(today, _parse_hms(entry_str))
+                    exit_time = datetime.combine(today, _parse_hms(exit_str))
+
+                    # 日を跨ぐ取引の場合、現在時刻を考慮して日付を調整
+                    if exit_time <= entry_time:
+                        exit_time += timedelta(days=1)
+                        # 現在時刻が0:00-6:00の範囲で、エントリー時刻も0:00-6:00の場合は前日として扱う
+                        if (now.hour < 6 and entry_time.hour < 6):
+                            entry_time -= timedelta(days=1)
+                            exit_time -= timedelta(days=1)
+                        # さらに、現在時刻が決済時刻を過ぎていない場合も前日として扱う
+                        elif now.hour < exit_time.hour:
+                            entry_time -= timedelta(days=1)
+                            exit_time -= timedelta(days=1)
+
+                    # 比較・配列化を整数演算だけにするため、リロード時に
+                    # epochナノ秒へ変換してしまう（datetimeは以後保持しない）
+                    schedule.append((int(entry_time.timestamp() * 1e9),
+                                     int(exit_time.timestamp() * 1e9)))
+                except Exception:
+                    continue
     except Exception as e:
         logging.error(f"trades.csvスケジュール取得エラー: {e}")
+        return schedule
+    if cache_key is not None:
+        with _schedule_cache_lock:
+            _schedule_cache[cache_key] = schedule
+            # 古いキーを捨てて直近2エントリのみ保持する
+            while len(_schedule_cache) > 2:
+                _schedule_cache.pop(next(iter(_schedule_cache)))
+    return schedule
+
+# 直近に返したスケジュール（periodic_position_check向けのロックフリー高速パス）
+_last_schedule_entry = (None, None)
+
+def get_schedule():
+    """
+    load_trades_scheduleの軽量ラッパー
+    mtime・日付・時間帯が前回と同じ間はos.stat 1回で前回の結果をそのまま返す
+    """
+    global _last_schedule_entry
+    try:
+        stat = os.stat(SCHEDULE_CSV)
+        now = datetime.now()
+        key = (stat.st_mtime_ns, now.date(), now.hour)
+    except OSError:
+        return load_trades_schedule()
+    last_key, last_schedule = _last_schedule_entry
+    if key == last_key:
+        return last_schedule
+    schedule = load_trades_schedule()
+    # タプルの差し替えはGILの下でアトミックなためロック不要
+    _last_schedule_entry = (key, schedule)
     return schedule
 
+def iter_trades_schedule_lines():
+    """
+    trades.csvからエントリー一覧を読み、Discord表示用の行を遅延生成する
+    """
+    try:
+        rows = _read_trades_rows()
+
+        yield "**今日の取引スケジュール**\n"
+        yield f"ファイル: {SCHEDULE_CSV}\n\n"
+
+        trade_count = 0
+        for row in rows:
+            if len(row) >= 5:
+                # 各フィールドのstripは1回だけ行い、空文字ならデフォルトへ置換
+                trade_number = row[0].strip() or f"{trade_count + 1}"
+                direction = row[1].strip() or "未設定"
+                symbol = row[2].strip() or "未設定"
+                entry_time = row[3].strip() or "未設定"
+                exit_time = row[4].strip() or "未設定"
+                lot_size = row[5].strip() if len(row) > 5 else ""
+                lot_size = lot_size or "auto"
+
+                # 方向を英語に変換
+                direction_eng = "long" if direction == "買" else "short" if direction == "売" else direction
+
+                # 通貨ペアの形式を変更（/を_に）
+                symbol_display = symbol.replace("/", "_")
+
+                # ロット表示
+                if lot_size == "" or lot_size == "自動":
+                    lot_display = "auto"
+                else:
+                    lot_display = lot_size
+
+                yield f"{trade_number},{symbol_display} Lot:{lot_display} {entry_time}-{exit_time}\n"
+
+                trade_count += 1
+
+        if trade_count == 0:
+            yield "取引スケジュールが見つかりませんでした。\n"
+            yield "trades.csvファイルを確認してください。"
+        else:
+            yield f"\n**合計: {trade_count}件の取引スケジュール**"
+
+    except FileNotFoundError:
+        yield f"ファイルが見つかりません: {SCHEDULE_CSV}"
+    except Exception as e:
+        logging.error(f"trades.csv表示用データ取得エラー: {e}")
+        yield f"trades.csvの読み込みエラー: {e}"
+
 def get_trades_schedule_for_display():
     """
     trades.csvからエントリー一覧を取得してDiscord表示用のメッセージを生成
     戻り値: Discord表示用のメッセージ文字列
     """
+    return "".join(iter_trades_schedule_lines())
+
+# スケジュール判定用のソート済み配列（同一スケジュールオブジェクトの間は再利用）
+_schedule_index_cache = {'schedule': None, 'index': None}
+
+_DAY_SECONDS = 86400
+# ビットマップ判定に使う監視バッファ（is_near_schedule_timeのデフォルトと一致）
+_NEAR_BUFFER_SECONDS = 5
+
+def _sec_of_day(ns):
+    """epochナノ秒をローカル時刻の「その日の経過秒」に変換する"""
+    dt = datetime.fromtimestamp(ns / 1e9)
+    return dt.hour * 3600 + dt.minute * 60 + dt.second
+
+def _mark_range(bmp, start, end):
+    """秒ビットマップの[start, end]をTrueにする（日跨ぎはラップして塗る）"""
+    if start <= end:
+        bmp[start:end + 1] = True
+    else:
+        bmp[start:] = True
+        bmp[:end + 1] = True
+
+def _schedule_index(schedule):
+    """
+    スケジュールからepochナノ秒のソート済み配列と
+    1日86400秒を離散化したO(1)判定用ビットマップを構築する
+    区間の重なりに対応するため、決済時刻は累積最大で持つ
+    """
+    if np is None or not schedule:
+        return None
+    if _schedule_index_cache['schedule'] is schedule:
+        return _schedule_index_cache['index']
+    ordered = sorted(schedule)
+    entries_ns = np.fromiter(
+        (e for e, _ in ordered), dtype=np.int64, count=len(ordered))
+    exits_ns = np.fromiter(
+        (x for _, x in ordered), dtype=np.int64, count=len(ordered))
+    # 取引時間内ビットマップと、エントリー/決済時刻±バッファのビットマップ
+    in_bmp = np.zeros(_DAY_SECONDS, dtype=np.bool_)
+    near_bmp = np.zeros(_DAY_SECONDS, dtype=np.bool_)
+    for e_ns, x_ns in ordered:
+        e_s = _sec_of_day(e_ns)
+        x_s = _sec_of_day(x_ns)
+        if (x_ns - e_ns) >= _DAY_SECONDS * 10**9:
+            in_bmp[:] = True
+        else:
+            _mark_range(in_bmp, e_s, x_s)
+        for point in (e_s, x_s):
+            _mark_range(near_bmp,
+                        (point - _NEAR_BUFFER_SECONDS) % _DAY_SECONDS,
+                        (point + _NEAR_BUFFER_SECONDS) % _DAY_SECONDS)
+    index = {
+        'entries_ns': entries_ns,
+        'cummax_exits_ns': np.maximum.accumulate(exits_ns),
+        'exit_points_ns': np.sort(exits_ns),
+        'in_bmp': in_bmp,
+        'near_bmp': near_bmp,
+    }
+    _schedule_index_cache['schedule'] = schedule
+    _schedule_index_cache['index'] = index
+    return index
+
+def _near_sorted_ns(points_ns, now_ns, buffer_ns):
+    """ソート済み配列中の最近傍点がbuffer_ns以内にあるか判定"""
+    i = int(np.searchsorted(points_ns, now_ns))
+    if i < len(points_ns) and points_ns[i] - now_ns <= buffer_ns:
+        return True
+    if i > 0 and now_ns - points_ns[i - 1] <= buffer_ns:
+        return True
+    return False
+
+if njit is not None and np is not None:
+    @njit(cache=True)
+    def _near_ns_jit(entries_ns, exits_ns, now_ns, buf_ns):
+        """エントリー・決済時刻のいずれかがnowのbuf_ns以内にあるか（ネイティブコード）"""
+        for i in range(entries_ns.shape[0]):
+            if abs(entries_ns[i] - now_ns) <= buf_ns or abs(exits_ns[i] - now_ns) <= buf_ns:
+                return True
+        return False
+
     try:
-        with open(SCHEDULE_CSV, mode='r', encoding='utf-8') as file:
-            reader = csv.reader(file)
-            header = next(reader)
-            
-            schedule_msg = "**今日の取引スケジュール**\n"
-            schedule_msg += f"ファイル: {SCHEDULE_CSV}\n\n"
-            
-            trade_count = 0
-            for row in reader:
-                if len(row) >= 5:
-                    trade_number = row[0].strip() if row[0].strip() else f"{trade_count + 1}"
-                    direction = row[1].strip() if len(row) > 1 and row[1].strip() else "未設定"
-                    symbol = row[2].strip() if len(row) > 2 and row[2].strip() else "未設定"
-                    entry_time = row[3].strip() if len(row) > 3 and row[3].strip() else "未設定"
-                    exit_time = row[4].strip() if len(row) > 4 and row[4].strip() else "未設定"
-                    lot_size = row[5].strip() if len(row) > 5 and row[5].strip() else "auto"
-                    
-                    # 方向を英語に変換
-                    direction_eng = "long" if direction == "買" else "short" if direction == "売" else direction
-                    
-                    # 通貨ペアの形式を変更（/を_に）
-                    symbol_display = symbol.replace("/", "_")
-                    
-                    # ロット表示
-                    if lot_size == "" or lot_size == "自動":
-                        lot_display = "auto"
-                    else:
-                        lot_display = lot_size
-                    
-                    schedule_msg += f"{trade_number},{symbol_display} Lot:{lot_display} {entry_time}-{exit_time}\n"
-                    
-                    trade_count += 1
-            
-            if trade_count == 0:
-                schedule_msg += "取引スケジュールが見つかりませんでした。\n"
-                schedule_msg += "trades.csvファイルを確認してください。"
-            else:
-                schedule_msg += f"\n**合計: {trade_count}件の取引スケジュール**"
-            
-            return schedule_msg
-            
-    except FileNotFoundError:
-        return f"ファイルが見つかりません: {SCHEDULE_CSV}"
+        # コンパイルコストはモジュール読み込み時に1回だけ払う
+        _near_ns_jit(np.zeros(1, np.int64), np.zeros(1, np.int64), 0, 0)
     except Exception as e:
-        logging.error(f"trades.csv表示用データ取得エラー: {e}")
-        return f"trades.csvの読み込みエラー: {e}"
+        logging.error(f"numbaウォームアップエラー: {e}")
+        _near_ns_jit = None
+else:
+    _near_ns_jit = None
 
 def is_in_trades_schedule(now, schedule):
     """
     現在時刻がtrades.csvのいずれかのエントリー～決済時間内か判定
     """
-    for entry, exit in schedule:
-        if entry <= now <= exit:
+    index = _schedule_index(schedule)
+    if index is not None:
+        # その日の経過秒で引くビットマップによるO(1)判定
+        return bool(index['in_bmp'][now.hour * 3600 + now.minute * 60 + now.second])
+    now_ns = int(now.timestamp() * 1e9)
+    for entry_ns, exit_ns in schedule:
+        if entry_ns <= now_ns <= exit_ns:
             return True
     return False
 
@@ -2823,17 +3529,21 @@ def is_near_schedule_time(now, schedule, buffer_seconds=5):
     現在時刻がエントリー時間または決済時間の前後buffer_seconds秒以内か判定
     エントリー直後や決済直前の監視を避けるため
     """
-    for entry, exit in schedule:
-        # エントリー時間の前後buffer_seconds秒
-        entry_start = entry - timedelta(seconds=buffer_seconds)
-        entry_end = entry + timedelta(seconds=buffer_seconds)
-        
-        # 決済時間の前後buffer_seconds秒
-        exit_start = exit - timedelta(seconds=buffer_seconds)
-        exit_end = exit + timedelta(seconds=buffer_seconds)
-        
+    now_ns = int(now.timestamp() * 1e9)
+    buffer_ns = int(buffer_seconds * 1e9)
+    index = _schedule_index(schedule)
+    if index is not None:
+        if buffer_seconds == _NEAR_BUFFER_SECONDS:
+            # 標準バッファはビットマップでO(1)判定
+            return bool(index['near_bmp'][now.hour * 3600 + now.minute * 60 + now.second])
+        if _near_ns_jit is not None:
+            return bool(_near_ns_jit(
+                index['entries_ns'], index['exit_points_ns'], now_ns, buffer_ns))
+        return (_near_sorted_ns(index['entries_ns'], now_ns, buffer_ns)
+                or _near_sorted_ns(index['exit_points_ns'], now_ns, buffer_ns))
+    for entry_ns, exit_ns in schedule:
         # 現在時刻がエントリー時間または決済時間の前後buffer_seconds秒以内
-        if (entry_start <= now <= entry_end) or (exit_start <= now <= exit_end):
+        if abs(entry_ns - now_ns) <= buffer_ns or abs(exit_ns - now_ns) <= buffer_ns:
             return True
     return False
 
@@ -2841,43 +3551,65 @@ def force_kill_all_positions_and_notify():
     """
     全ポジションを強制決済し、損益情報をdiscord通知
     """
-    positions = broker.get_all_positions()
-    if not positions:
+    # ポジションと現在価格をまとめて取得（往復を重ねて1回分の待ちで済ませる）
+    try:
+        positions_with_prices = broker.get_positions_with_prices()
+    except Exception as e:
+        logging.error(f"強制決済時のポジション・価格取得エラー: {e}")
+        return
+    if not positions_with_prices:
         return
     total_pips = 0
     total_amount = 0
-    msg = "🚨 強制決済（kill）を実行しました\n"
-    for pos in positions:
+    # メッセージは+=ではなくリストに溜めて最後にjoinする
+    msg_parts = ["🚨 強制決済（kill）を実行しました"]
+    # 決済対象と見込み損益を先に確定させる
+    to_close = []
+    for pos, ticker in positions_with_prices:
         try:
+            if ticker is None:
+                continue
             entry_price = float(pos.price)
             size = float(pos.size)
             symbol = pos.symbol
             side = pos.side
-            # 現在価格取得
-            tickers = broker.get_tickers([symbol])
-            if not tickers or 'data' not in tickers:
-                continue
-            rate_data = None
-            for item in tickers['data']:
-                if item['symbol'] == symbol:
-                    rate_data = item
-                    break
-            if not rate_data:
-                continue
-            current_price = float(rate_data['bid']) if side == 'BUY' else float(rate_data['ask'])
+            current_price = float(ticker.bid) if side == 'BUY' else float(ticker.ask)
             # 損益計算
             profit_pips = calculate_profit_pips(entry_price, current_price, side, symbol)
             profit_amount = calculate_profit_amount(entry_price, current_price, side, symbol, size)
-            total_pips += profit_pips
-            total_amount += profit_amount
-            # 決済
-            exit_side = 'SELL' if side == 'BUY' else 'BUY'
-            broker.close_position(symbol, pos.position_id, size, exit_side)
-            msg += f"{symbol} {side} {size}lot: {profit_pips:.1f}pips, {profit_amount:.0f}円\n"
+            to_close.append((pos, size, profit_pips, profit_amount))
         except Exception as e:
             logging.error(f"強制決済エラー: {e}")
-    msg += f"\n合計損益: {total_pips:.1f}pips, {total_amount:.0f}円"
-    send_discord_message(msg)
+    # 決済注文は並列に発行し、待ち時間を往復の合計ではなく最大値に抑える
+    if to_close:
+        with ThreadPoolExecutor(max_workers=min(8, len(to_close))) as executor:
+            futures = {}
+            for pos, size, profit_pips, profit_amount in to_close:
+                exit_side = 'SELL' if pos.side == 'BUY' else 'BUY'
+                future = executor.submit(
+                    broker.close_position, pos.symbol, pos.position_id, size, exit_side)
+                futures[future] = (pos, size, profit_pips, profit_amount)
+            for future in as_completed(futures):
+                pos, size, profit_pips, profit_amount = futures[future]
+                try:
+                    future.result()
+                    total_pips += profit_pips
+                    total_amount += profit_amount
+                    msg_parts.append(
+                        f"{pos.symbol} {pos.side} {size}lot: {profit_pips:.1f}pips, {profit_amount:.0f}円")
+                except Exception as e:
+                    logging.error(f"強制決済エラー: {e}")
+    msg_parts.append(f"\n合計損益: {total_pips:.1f}pips, {total_amount:.0f}円")
+    # 一括決済後の最終残高はキャッシュを破棄して1回だけ取り直す
+    try:
+        invalidate_balance_cache()
+        balance_data = get_balance_cached()
+        # get_balance_cachedはBalanceデータクラスを返す
+        if balance_data is not None:
+            msg_parts.append(f"決済後残高: {float(balance_data.total_balance):.0f}円")
+    except Exception as e:
+        logging.error(f"強制決済後の残高取得エラー: {e}")
+    send_discord_message_async("\n".join(msg_parts))
 
 def periodic_position_check():
     """
@@ -2888,7 +3620,7 @@ def periodic_position_check():
         while True:
             try:
                 now = datetime.now()
-                schedule = load_trades_schedule()
+                schedule = get_schedule()
                 positions = broker.get_all_positions()
                 
                 # エントリー時間または決済時間の前後5秒以内の場合は監視をスキップ
@@ -2938,61 +3670,84 @@ def monitor_and_close_positions(positions_to_monitor):
                 logging.error(f"価格データ変換エラー ({t.get('symbol', 'unknown')}): {e}")
                 continue
         
-        # ポジションごとに損益計算と決済判定
-        positions_to_remove = []  # 削除対象を記録
+        # 価格が取得できたポジションのみ損益計算の対象にする
+        monitored = []
         for position in positions_to_monitor:
-            symbol = position.symbol
-            if symbol not in current_prices:
+            if position.symbol not in current_prices:
                 continue
-            
             try:
-                # ポジション情報の型変換を強化
-                entry_price = float(position.price)
+                float(position.price)
+            except (ValueError, TypeError) as e:
+                logging.error(f"数値変換エラー ({position.symbol}): {e}")
+                continue
+            monitored.append(position)
+
+        positions_to_remove = []  # 削除対象を記録
+        if np is not None and monitored:
+            # 損益pipsを全ポジション分まとめてベクトル計算し、
+            # 条件に掛かったインデックスだけPython側で決済処理する
+            n = len(monitored)
+            entry = np.fromiter((float(p.price) for p in monitored), dtype=np.float64, count=n)
+            side = np.fromiter((1.0 if p.side == "BUY" else -1.0 for p in monitored),
+                               dtype=np.float64, count=n)
+            bids = np.fromiter((current_prices[p.symbol]['bid'] for p in monitored),
+                               dtype=np.float64, count=n)
+            asks = np.fromiter((current_prices[p.symbol]['ask'] for p in monitored),
+                               dtype=np.float64, count=n)
+            pip_mul = np.fromiter((1.0 / get_pip_value(p.symbol) for p in monitored),
+                                  dtype=np.float64, count=n)
+            # BUYはbid、SELLはaskで評価（calculate_current_profit_pipsと同一）
+            cur = np.where(side > 0, bids, asks)
+            pips = side * (cur - entry) * pip_mul
+            sl_hits = np.nonzero(pips <= -STOP_LOSS_PIPS)[0] if STOP_LOSS_PIPS else ()
+            tp_hits = np.nonzero(pips >= TAKE_PROFIT_PIPS)[0] if TAKE_PROFIT_PIPS else ()
+            tp_only = [i for i in tp_hits if i not in set(sl_hits)]
+            for i, label in [(i, "ストップロス") for i in sl_hits] + \
+                            [(i, "テイクプロフィット") for i in tp_only]:
+                position = monitored[i]
+                send_discord_message_async(
+                    f"{position.symbol} {position.side} ポジションが{label}条件に達しました: {pips[i]:.1f} pips"
+                )
+                close_position_by_info(position, datetime.now(), auto_closed=True)
+                positions_to_remove.append(position)
+        else:
+            # NumPyが無い場合は従来通り1件ずつ計算
+            for position in monitored:
+                symbol = position.symbol
                 side = position.side
-                current_price = current_prices[symbol]
-                
-                # 含み損益計算
                 profit_pips = calculate_current_profit_pips(
-                    entry_price, 
-                    current_price, 
-                    side, 
+                    float(position.price),
+                    current_prices[symbol],
+                    side,
                     symbol
                 )
-                
+
                 # ストップロス判定
                 if STOP_LOSS_PIPS and profit_pips <= -STOP_LOSS_PIPS:
-                    send_discord_message(
+                    send_discord_message_async(
                         f"{symbol} {side} ポジションがストップロス条件に達しました: {profit_pips:.1f} pips"
                     )
                     close_position_by_info(position, datetime.now(), auto_closed=True)
                     positions_to_remove.append(position)
-                
+
                 # テイクプロフィット判定
                 elif TAKE_PROFIT_PIPS and profit_pips >= TAKE_PROFIT_PIPS:
-                    send_discord_message(
+                    send_discord_message_async(
                         f"{symbol} {side} ポジションがテイクプロフィット条件に達しました: {profit_pips:.1f} pips"
                     )
                     close_position_by_info(position, datetime.now(), auto_closed=True)
                     positions_to_remove.append(position)
-                    
-            except KeyError as e:
-                logging.error(f"ポジション情報のキー不足エラー: {e}")
-                continue
-            except ValueError as e:
-                logging.error(f"数値変換エラー ({symbol}): {e}")
-                continue
         
-        # 削除対象のポジションを一括削除（スレッドセーフ）
-        for position in positions_to_remove:
-            try:
-                positions_to_monitor.remove(position)
-            except ValueError:
-                # 既に削除されている場合は無視
-                pass
+        # 削除対象のポジションを一括削除（O(n)の再構築・インプレース代入）
+        if positions_to_remove:
+            drop = set()
+            for position in positions_to_remove:
+                drop.add(id(position))
+            positions_to_monitor[:] = [p for p in positions_to_monitor if id(p) not in drop]
                 
     except Exception as e:
         logging.error(f"ポジション監視処理全体のエラー: {e}")
-        send_discord_message(f"⚠️ ポジション監視システムエラー: {str(e)}")
+        send_discord_message_async(f"⚠️ ポジション監視システムエラー: {str(e)}")
 
 def close_position_by_info(position, exit_time, auto_closed=False, trade_index=None):
     """
@@ -3004,12 +3759,18 @@ def close_position_by_info(position, exit_time, auto_closed=False, trade_index=N
     average_exit_price = broker.close_position(
         position.symbol, position.position_id, position.size, exit_side
     )
+    invalidate_balance_cache()  # 決済で残高が変わるためキャッシュを破棄
+    invalidate_positions_cache()
     profit_pips = calculate_profit_pips(
         float(position.price), average_exit_price, position.side, position.symbol
     )
     profit_amount = calculate_profit_amount(
         float(position.price), average_exit_price, position.side, position.symbol, position.size
     )
+    # 現在時刻は一度だけ取得して使い回す
+    now = datetime.now()
+    now_hms = now.strftime('%H:%M:%S')
+    today = now.date()
     trade_results.append({
         "symbol": position.symbol,
         "side": position.side,
@@ -3018,14 +3779,16 @@ def close_position_by_info(position, exit_time, auto_closed=False, trade_index=N
         "profit_pips": profit_pips,
         "profit_amount": profit_amount,
         "lot_size": position.size,
-        "entry_time": getattr(position, 'entry_time', datetime.now().strftime('%H:%M:%S')),
-        "exit_time": datetime.now().strftime('%H:%M:%S'),
-        "entry_date": getattr(position, 'entry_date', datetime.now().date()),
-        "exit_date": datetime.now().date(),
+        "entry_time": getattr(position, 'entry_time', now_hms),
+        "exit_time": now_hms,
+        "entry_date": getattr(position, 'entry_date', today),
+        "exit_date": today,
+        "_exit_dt": now,  # 解析済み決済時刻（日次確定処理での再解析を省く）
     })
+    record_daily_stats(trade_results[-1])
     close_type = "自動決済" if auto_closed else "予定決済"
-    # 証拠金残高取得
-    balance_data = broker.get_balance()
+    # 証拠金残高取得（短TTLキャッシュ経由）
+    balance_data = get_balance_cached()
     data = balance_data.get('data')
     if isinstance(data, list) and len(data) > 0:
         balance_amount = float(data[0].get('balance', 0))
@@ -3033,39 +3796,114 @@ def close_position_by_info(position, exit_time, auto_closed=False, trade_index=N
         balance_amount = float(data.get('balance', 0))
     else:
         balance_amount = 0
-    send_discord_message(
-        f"{close_type}しました: 通貨ペア={position.symbol}, 売買方向={position.side}, "
-        f"エントリー価格={position.price}, 決済価格={average_exit_price}, 損益pips={profit_pips} ({profit_amount}円), ロット数={position.size} "
-        f"(決済時間: {datetime.now().strftime('%H:%M:%S')})\n"
-        f"現在の証拠金残高: {balance_amount}円"
-    )
-    print(f"【決済完了】{close_type}: {position.symbol} {position.side} {position.price}→{average_exit_price} {profit_pips}pips ({profit_amount}円) ロット数:{position.size}")
+    _emit_close_event({
+        'close_type': close_type,
+        'symbol': position.symbol,
+        'side': position.side,
+        'entry_price': position.price,
+        'exit_price': average_exit_price,
+        'profit_pips': profit_pips,
+        'profit_amount': profit_amount,
+        'lot_size': position.size,
+        'exit_time': now_hms,
+        'balance_amount': balance_amount,
+    })
     return profit_pips
 
 def schedule_position_check(symbol, expected_close_time):
     """
     エントリー失敗後も定期的にポジションを確認し、あれば決済する
+    cancel_position_check(symbol)で外部から即時解除できる
     """
-    end_time = expected_close_time + timedelta(minutes=10)
-    while datetime.now() < end_time:
-        positions = check_current_positions(symbol)
-        if positions:
-            logging.warning(f"未認識のポジションが見つかりました。決済を実行します: {positions}")
-            for position in positions:
-                exit_side = "SELL" if position.side == "BUY" else "BUY"
-                try:
-                    broker.close_position(position.symbol, position.position_id, position.size, exit_side)
-                    send_discord_message(f"⚠️ 未認識ポジションを検出し決済しました: {position.symbol} {position.side}")
-                except Exception as e:
-                    logging.error(f"未認識ポジション決済中のエラー: {e}")
-            return True
-        # 次の確認まで待機
-        time.sleep(POSITION_CHECK_INTERVAL)
-    return False
+    event = threading.Event()
+    with _position_check_events_lock:
+        _position_check_events[symbol] = event
+    # 残り監視時間はmonotonicで計る（時刻変更・DSTの影響を受けない）
+    deadline = time.monotonic() + max(
+        0.0, (expected_close_time + timedelta(minutes=10) - datetime.now()).total_seconds())
+    check_interval = POSITION_CHECK_INTERVAL
+    try:
+        while time.monotonic() < deadline:
+            positions = check_current_positions(symbol)
+            if positions:
+                logging.warning(f"未認識のポジションが見つかりました。決済を実行します: {positions}")
+                for position in positions:
+                    exit_side = "SELL" if position.side == "BUY" else "BUY"
+                    try:
+                        broker.close_position(position.symbol, position.position_id, position.size, exit_side)
+                        send_discord_message_async(f"⚠️ 未認識ポジションを検出し決済しました: {position.symbol} {position.side}")
+                    except Exception as e:
+                        logging.error(f"未認識ポジション決済中のエラー: {e}")
+                return True
+            # ポジションが見つからない間は確認間隔を指数的に延ばす（最大60秒）
+            # jitterを加えて確認タイミングの同期を避ける
+            # イベントがsetされたら待機を打ち切って即終了する
+            if event.wait(check_interval * (0.8 + 0.4 * random.random())):
+                break
+            check_interval = min(check_interval * 1.5, 60)
+        return False
+    finally:
+        with _position_check_events_lock:
+            if _position_check_events.get(symbol) is event:
+                del _position_check_events[symbol]
 
 # ===============================
 # メイン関数
 # ===============================
+def _startup_announce(snapshot_symbols=()):
+    """初回バックアップと起動時のDiscord通知をまとめて行う（別スレッド用）"""
+    # 初回バックアップ実行
+    try:
+        backup_path = backup_config_and_data()
+        if backup_path:
+            logging.info(f"初回バックアップ完了: {backup_path}")
+            send_discord_message(f"初回バックアップ完了: {backup_path}")
+    except Exception as e:
+        logging.error(f"初回バックアップエラー: {e}")
+
+    try:
+        # 自動再起動設定の通知
+        if AUTO_RESTART_HOUR is not None:
+            send_discord_message(f"自動取引システムを開始しました。毎日継続実行します。\n🔄 自動再起動設定: 毎日{AUTO_RESTART_HOUR}時に再起動")
+        else:
+            send_discord_message("自動取引システムを開始しました。毎日継続実行します。\n🔄 自動再起動: 無効（連続運転）")
+
+        # システム情報を通知
+        system_info = get_system_status()
+        if system_info:
+            info_msg = (
+                f"📊 **システム情報**\n"
+                f"メモリ使用量: {system_info['memory_usage']:.1f}MB ({system_info['memory_percent']:.1f}%)\n"
+                f"ディスク空き容量: {system_info['disk_free_gb']:.1f}GB\n"
+                f"レートリミット: {system_info['rate_limit']}回/秒\n"
+                f"システム状態: {'✅ 正常' if system_info['overall_health'] else '⚠️ 注意'}"
+            )
+            send_discord_message(info_msg)
+
+        # trades.csvのエントリー一覧を通知
+        schedule_display = get_trades_schedule_for_display()
+        send_discord_message(schedule_display)
+    except Exception as e:
+        logging.error(f"起動通知エラー: {e}")
+
+    # 口座スナップショット（残高・ポジション・価格を並行取得）を通知
+    try:
+        snapshot = broker.get_snapshot(list(snapshot_symbols))
+        lines = ["💼 **口座スナップショット**"]
+        balance = snapshot.get('balance')
+        if balance:
+            lines.append(f"残高: {balance.total_balance:,.0f} {balance.currency} "
+                         f"(利用可能: {balance.available_amount:,.0f})")
+        positions = snapshot.get('positions') or []
+        lines.append(f"保有ポジション: {len(positions)}件")
+        tickers = snapshot.get('tickers') or {}
+        for sym in sorted(tickers):
+            ticker = tickers[sym]
+            lines.append(f"{sym}: bid={ticker.bid} ask={ticker.ask}")
+        send_discord_message("\n".join(lines))
+    except Exception as e:
+        logging.error(f"口座スナップショット通知エラー: {e}")
+
 def main():
     """メイン関数（新機能統合版）"""
     try:
@@ -3089,7 +3927,18 @@ def main():
         if schedule is None:
             logging.error("取引スケジュールの初期化に失敗しました")
             sys.exit(1)
-        
+
+        # スケジュール対象銘柄の価格ストリームを開始
+        # （broker.get_tickersはストリームのキャッシュを優先して返す）
+        stream_symbols = []
+        try:
+            stream_symbols = sorted({t.symbol.replace('/', '_')
+                                     for t in schedule.get_trades_for_today()})
+            if stream_symbols:
+                broker.start_pricing_stream(stream_symbols)
+        except Exception as e:
+            logging.error(f"価格ストリーム開始エラー: {e}")
+
         # 定期position監視を開始
         periodic_position_check()
         
@@ -3099,35 +3948,12 @@ def main():
         # 取引数量リセットスケジューラーを起動
         daily_volume_reset_scheduler()
         
-        # 初回バックアップ実行
-        try:
-            backup_path = backup_config_and_data()
-            if backup_path:
-                logging.info(f"初回バックアップ完了: {backup_path}")
-                send_discord_message(f"初回バックアップ完了: {backup_path}")
-        except Exception as e:
-            logging.error(f"初回バックアップエラー: {e}")
-        
-        # 自動再起動設定の通知
-        if AUTO_RESTART_HOUR is not None:
-            send_discord_message(f"自動取引システムを開始しました。毎日継続実行します。\n🔄 自動再起動設定: 毎日{AUTO_RESTART_HOUR}時に再起動")
-        else:
-            send_discord_message("自動取引システムを開始しました。毎日継続実行します。\n🔄 自動再起動: 無効（連続運転）")
-        
-        # システム情報を通知
-        system_info = get_system_status()
-        if system_info:
-            info_msg = f"📊 **システム情報**\n"
-            info_msg += f"メモリ使用量: {system_info['memory_usage']:.1f}MB ({system_info['memory_percent']:.1f}%)\n"
-            info_msg += f"ディスク空き容量: {system_info['disk_free_gb']:.1f}GB\n"
-            info_msg += f"レートリミット: {system_info['rate_limit']}回/秒\n"
-            info_msg += f"システム状態: {'✅ 正常' if system_info['overall_health'] else '⚠️ 注意'}"
-            send_discord_message(info_msg)
-        
-        # trades.csvのエントリー一覧を通知
-        schedule_display = get_trades_schedule_for_display()
-        send_discord_message(schedule_display)
-        
+        # 初回バックアップと起動通知はバックグラウンドで実行し、
+        # webhookのレイテンシで取引ループの開始を遅らせない
+        # （通知順はワーカースレッド内で直列に保たれる）
+        threading.Thread(target=_startup_announce, args=(stream_symbols,),
+                         daemon=True, name="startup-announce").start()
+
         # Discord Botが有効な場合は別スレッドで起動
         if DISCORD_BOT_TOKEN:
             bot_thread = threading.Thread(target=run_bot, daemon=True)
@@ -3147,71 +3973,36 @@ def main():
 # ===============================
 def get_today_trades():
     """当日（0:00から現在まで）の取引を取得"""
-    today = datetime.now().date()
-    today_trades = []
-    
-    for trade in trade_results:
-        try:
-            # exit_dateから日付を抽出
-            if 'exit_date' in trade:
-                trade_date = trade['exit_date']
-                if isinstance(trade_date, str):
-                    trade_date = datetime.strptime(trade_date, '%Y-%m-%d').date()
-                elif isinstance(trade_date, datetime):
-                    trade_date = trade_date.date()
-                
-                # 今日の取引かチェック
-                if trade_date == today:
-                    today_trades.append(trade)
-            else:
-                # 後方互換性のため、exit_timeから推定（ただし正確ではない）
-                if 'exit_time' in trade and trade['exit_time']:
-                    logging.warning(f"取引データに日付情報がありません: {trade}")
-        except Exception as e:
-            logging.warning(f"取引日付解析エラー: {e}, trade: {trade}")
-            continue
-    
-    return today_trades
+    # 記録時に構築される日付索引を引くだけ（全件走査・strptime再解析なし）
+    return list(trades_by_date.get(datetime.now().date(), ()))
 
 def get_trades_by_date_offset(days_offset):
     """指定日数前の取引を取得（例：-1で前日、-2で2日前）"""
     target_date = datetime.now().date() + timedelta(days=days_offset)
-    target_trades = []
-    
-    for trade in trade_results:
-        try:
-            # exit_timeから日付を抽出
-            if 'exit_time' in trade and trade['exit_time']:
-                # exit_timeの形式: 'HH:MM:SS'
-                exit_time_str = trade['exit_time']
-                
-                # 取引データに日付情報があるかチェック
-                if 'exit_date' in trade:
-                    # 日付情報がある場合はそれを使用
-                    trade_date = trade['exit_date']
-                    if isinstance(trade_date, str):
-                        trade_date = datetime.strptime(trade_date, '%Y-%m-%d').date()
-                    elif isinstance(trade_date, datetime):
-                        trade_date = trade_date.date()
-                else:
-                    # 日付情報がない場合は、現在の日付を基準に推定
-                    # ただし、これは正確ではないため、ログに警告を出力
-                    logging.warning(f"取引データに日付情報がありません: {trade}")
-                    continue
-                
-                # 指定日の取引かチェック
-                if trade_date == target_date:
-                    target_trades.append(trade)
-        except Exception as e:
-            logging.warning(f"取引日付解析エラー: {e}, trade: {trade}")
-            continue
-    
+    target_trades = list(trades_by_date.get(target_date, ()))
+
+    # メモリ内ウィンドウに該当日の取引がなければJSONL履歴から読み出す
+    if not target_trades:
+        target_trades = _load_trades_from_jsonl(target_date)
+
     return target_trades, target_date
 
+# trade_resultsのDataFrameキャッシュ（世代カウンタが変わったときだけ再構築）
+_df_cache = {'rev': -1, 'df': None}
+
+def _trades_df():
+    """trade_resultsのDataFrameを返す（内容が変わるまでキャッシュを再利用）"""
+    if pd is None:
+        return None
+    if _df_cache['df'] is None or _df_cache['rev'] != trade_results_rev:
+        _df_cache['df'] = pd.DataFrame(trade_results)
+        _df_cache['rev'] = trade_results_rev
+    return _df_cache['df']
+
 def collect_metrics(use_today_only=False, days_offset=None):
     """取引メトリクスを収集"""
     global performance_metrics
-    
+
     if use_today_only:
         trades = get_today_trades()
         period = "今日"
@@ -3225,49 +4016,100 @@ def collect_metrics(use_today_only=False, days_offset=None):
     if not trades:
         return None
     
-    # 基本統計
     total_trades = len(trades)
-    winning_trades = len([t for t in trades if t.get('profit_amount', 0) > 0])
-    losing_trades = len([t for t in trades if t.get('profit_amount', 0) < 0])
+
+    if np is not None:
+        # NumPyによるベクトル化パス（7回のPythonループを数個のCカーネルに置換）
+        if pd is not None:
+            # 全期間はキャッシュ済みDataFrameを再利用し、期間指定はその場で構築する
+            df = _trades_df() if trades is trade_results else pd.DataFrame(trades)
+            if 'profit_amount' in df.columns:
+                amounts = df['profit_amount'].fillna(0).to_numpy(dtype=float)
+            else:
+                amounts = np.zeros(total_trades)
+            if 'profit_pips' in df.columns:
+                pips = df['profit_pips'].fillna(0).to_numpy(dtype=float)
+            else:
+                pips = np.zeros(total_trades)
+        elif trades is trade_results and len(trade_columns) == total_trades:
+            # 列指向ミラーのdouble配列をそのままNumPy配列へコピー
+            amounts = np.array(trade_columns.profit_amounts, dtype=np.float64)
+            pips = np.array(trade_columns.profit_pips, dtype=np.float64)
+        else:
+            amounts = np.fromiter((t.get('profit_amount', 0) or 0 for t in trades),
+                                  dtype=np.float64, count=total_trades)
+            pips = np.fromiter((t.get('profit_pips', 0) or 0 for t in trades),
+                               dtype=np.float64, count=total_trades)
+
+        # 基本統計
+        winning_trades = int((amounts > 0).sum())
+        losing_trades = int((amounts < 0).sum())
+
+        # 損益統計
+        total_profit_pips = float(pips.sum())
+        total_profit_amount = float(amounts.sum())
+
+        # 最大・最小値
+        max_profit = float(amounts.max()) if winning_trades > 0 else 0
+        max_loss = float(amounts.min()) if losing_trades > 0 else 0
+
+        # ドローダウン計算（累積損益と累積最大値の差）
+        cumulative = np.cumsum(amounts)
+        running_max = np.maximum.accumulate(np.maximum(cumulative, 0))
+        max_drawdown = float((running_max - cumulative).max())
+        max_drawdown_amount = max_drawdown
+
+        # シャープレシオ（簡略版）
+        if total_trades > 1:
+            avg_return = float(amounts.mean())
+            variance = float(amounts.var())
+            sharpe_ratio = avg_return / (variance ** 0.5) if variance > 0 else 0
+        else:
+            sharpe_ratio = 0
+    else:
+        # 全期間なら列指向ミラーの連続したdouble配列をそのまま走査する
+        if trades is trade_results and len(trade_columns) == total_trades:
+            pairs = zip(trade_columns.profit_amounts, trade_columns.profit_pips)
+        else:
+            pairs = ((t.get('profit_amount', 0) or 0, t.get('profit_pips', 0) or 0)
+                     for t in trades)
+
+        # 件数・合計・二乗和・勝敗・最大最小・ドローダウンを1パスで集計する
+        winning_trades = losing_trades = 0
+        total_profit_amount = total_profit_pips = sum_sq = 0.0
+        max_profit = max_loss = 0
+        cumulative_pnl = max_cumulative = max_drawdown = 0.0
+        for pnl, pip in pairs:
+            total_profit_amount += pnl
+            total_profit_pips += pip
+            sum_sq += pnl * pnl
+            if pnl > 0:
+                winning_trades += 1
+                if pnl > max_profit:
+                    max_profit = pnl
+            elif pnl < 0:
+                losing_trades += 1
+                if pnl < max_loss:
+                    max_loss = pnl
+            cumulative_pnl += pnl
+            # 条件式による更新（符号がランダムなpnlでは分岐予測が効かないため）
+            max_cumulative = max_cumulative if max_cumulative >= cumulative_pnl else cumulative_pnl
+            drawdown = max_cumulative - cumulative_pnl
+            max_drawdown = max_drawdown if max_drawdown >= drawdown else drawdown
+        max_drawdown_amount = max_drawdown
+
+        # シャープレシオ（簡略版、分散は E[x^2] - E[x]^2 で導出）
+        if total_trades > 1:
+            avg_return = total_profit_amount / total_trades
+            variance = sum_sq / total_trades - avg_return ** 2
+            sharpe_ratio = avg_return / (variance ** 0.5) if variance > 0 else 0
+        else:
+            sharpe_ratio = 0
+
     win_rate = (winning_trades / total_trades * 100) if total_trades > 0 else 0
-    
-    # 損益統計
-    total_profit_pips = sum([t.get('profit_pips', 0) for t in trades])
-    total_profit_amount = sum([t.get('profit_amount', 0) for t in trades])
     average_profit_pips = total_profit_pips / total_trades if total_trades > 0 else 0
     average_profit_amount = total_profit_amount / total_trades if total_trades > 0 else 0
-    
-    # 最大・最小値
-    profits = [t.get('profit_amount', 0) for t in trades if t.get('profit_amount', 0) > 0]
-    losses = [t.get('profit_amount', 0) for t in trades if t.get('profit_amount', 0) < 0]
-    
-    max_profit = max(profits) if profits else 0
-    max_loss = min(losses) if losses else 0
-    
-    # ドローダウン計算
-    cumulative_pnl = 0
-    max_cumulative = 0
-    max_drawdown = 0
-    max_drawdown_amount = 0
-    
-    for trade in trades:
-        pnl = trade.get('profit_amount', 0)
-        cumulative_pnl += pnl
-        max_cumulative = max(max_cumulative, cumulative_pnl)
-        drawdown = max_cumulative - cumulative_pnl
-        if drawdown > max_drawdown:
-            max_drawdown = drawdown
-            max_drawdown_amount = drawdown
-    
-    # シャープレシオ（簡略版）
-    if len(trades) > 1:
-        returns = [t.get('profit_amount', 0) for t in trades]
-        avg_return = sum(returns) / len(returns)
-        variance = sum([(r - avg_return) ** 2 for r in returns]) / len(returns)
-        sharpe_ratio = avg_return / (variance ** 0.5) if variance > 0 else 0
-    else:
-        sharpe_ratio = 0
-    
+
     return {
         'period': period,
         'total_trades': total_trades,
@@ -3288,34 +4130,72 @@ def collect_metrics(use_today_only=False, days_offset=None):
         'total_api_fee': total_api_fee
     }
 
+def _seconds_until_hour(target_hour):
+    """
+    次にローカル時刻がtarget_hour:00:00になるまでの秒数を返す
+    datetimeを組み立てずtime.time()の整数演算で求める（ログ用に現在epochも返す）
+    """
+    t = time.time()
+    lt = time.localtime(t)
+    secs_today = lt.tm_hour * 3600 + lt.tm_min * 60 + lt.tm_sec
+    wait = (target_hour * 3600 - secs_today) % 86400
+    if wait == 0:
+        wait = 86400
+    return t, wait
+
+# スケジューラースレッドの停止用イベント
+# （GracefulShutdownのシグナルハンドラがシャットダウン時にsetする）
+_stop_event = threading.Event()
+
+def _interruptible_sleep(wait_seconds):
+    """
+    停止イベントを監視しながらwait_seconds待機する
+    300秒単位に分割して壁時計を再確認するため、サスペンド復帰等で
+    単発の長いsleepが狂っても起床時刻が大きくずれない
+    停止イベントがsetされた場合はTrueを返す
+    """
+    end = time.time() + wait_seconds
+    while True:
+        remaining = end - time.time()
+        if remaining <= 0:
+            return False
+        if _stop_event.wait(min(300, remaining)):
+            return True
+
 def auto_restart_scheduler():
     """毎日指定時刻に自動再起動するスレッド"""
+    cached_cfg = None
+    cached_mtime = None
+
     def loop():
+        nonlocal cached_cfg, cached_mtime
         while True:
             try:
-                # 設定を再読み込み（実行中に変更された場合のため）
-                current_config = load_config()
-                restart_hour = current_config.get('auto_restart_hour')
+                # 設定の再読み込みはファイル更新時のみ（mtimeが同じ間はキャッシュを再利用）
+                try:
+                    mtime = os.path.getmtime(CONFIG_FILE)
+                except OSError:
+                    mtime = None
+                if cached_cfg is None or mtime != cached_mtime:
+                    cached_cfg = load_config()
+                    cached_mtime = mtime
+                restart_hour = cached_cfg.get('auto_restart_hour')
                 
                 if restart_hour is None:
                     # 自動再起動が無効な場合は1時間待機
-                    time.sleep(3600)
+                    if _interruptible_sleep(3600):
+                        return
                     continue
                 
-                now = datetime.now()
-                next_restart = now.replace(hour=restart_hour, minute=0, second=0, microsecond=0)
-                
-                # 今日の指定時刻が既に過ぎている場合は明日に設定
-                if now >= next_restart:
-                    next_restart += timedelta(days=1)
-                
-                wait_seconds = (next_restart - now).total_seconds()
-                
+                # epoch秒の整数演算で待機時間を求める（datetimeはログ表示時のみ生成）
+                t, wait_seconds = _seconds_until_hour(restart_hour)
+                next_restart = datetime.fromtimestamp(t + wait_seconds)
                 logging.info(f"自動再起動スケジューラー: 次回再起動時刻 {next_restart.strftime('%Y/%m/%d %H:%M:%S')} (待機時間: {wait_seconds:.0f}秒)")
                 
-                # 指定時刻まで待機
-                time.sleep(wait_seconds)
-                
+                # 指定時刻まで待機（停止イベントで中断可能）
+                if _interruptible_sleep(wait_seconds):
+                    return
+
                 # 再起動実行
                 logging.warning(f"自動再起動時刻({restart_hour}時)に達しました。システムを再起動します。")
                 send_discord_message(f"🔄 自動再起動時刻({restart_hour}時)に達しました。システムを再起動します。")
@@ -3325,7 +4205,8 @@ def auto_restart_scheduler():
                 
             except Exception as e:
                 logging.error(f"自動再起動スケジューラーエラー: {e}")
-                time.sleep(3600)  # エラー時は1時間待機
+                if _interruptible_sleep(3600):  # エラー時は1時間待機
+                    return
     
     t = threading.Thread(target=loop, daemon=True)
     t.start()
@@ -3336,15 +4217,12 @@ def daily_volume_reset_scheduler():
     def loop():
         while True:
             try:
-                # 毎日午前0時に実行
-                now = datetime.now()
-                target_time = now.replace(hour=0, minute=0, second=0, microsecond=0)
-                if now >= target_time:
-                    target_time += timedelta(days=1)
-                
-                wait_seconds = (target_time - now).total_seconds()
+                # 毎日午前0時に実行（epoch秒の整数演算で待機時間を求める）
+                t, wait_seconds = _seconds_until_hour(0)
+                target_time = datetime.fromtimestamp(t + wait_seconds)
                 logging.info(f"取引数量リセットスケジューラー: 次回リセット時刻 {target_time.strftime('%Y/%m/%d %H:%M:%S')} (待機時間: {wait_seconds:.0f}秒)")
-                time.sleep(wait_seconds)
+                if _interruptible_sleep(wait_seconds):
+                    return
                 
                 # 銘柄別取引数量をリセット
                 global symbol_daily_volume
@@ -3354,7 +4232,8 @@ def daily_volume_reset_scheduler():
                 
             except Exception as e:
                 logging.error(f"取引数量リセットスケジューラーエラー: {e}")
-                time.sleep(3600)  # エラー時は1時間待機
+                if _interruptible_sleep(3600):  # エラー時は1時間待機
+                    return
     
     thread = threading.Thread(target=loop, daemon=True)
     thread.start()
@@ -3392,40 +4271,48 @@ def auto_restart_on_error():
     
     return True
 
-def save_daily_results():
-    """日次取引結果をCSVファイルに保存"""
-    global trade_results
-    today = datetime.now().strftime('%Y-%m-%d')
-    
-    # daily_resultsディレクトリを作成
+_DAILY_RESULTS_HEADER = ['日付', '通貨ペア', '売買方向', 'エントリー価格', '決済価格',
+                         'ロット数', '損益pips', '損益金額(円)', 'エントリー時刻', '決済時刻']
+
+def _trade_row(today, trade):
+    """日次結果CSVの1行分を組み立てる"""
+    return [
+        today,
+        trade['symbol'],
+        trade['side'],
+        trade['entry_price'],
+        trade['exit_price'],
+        trade.get('lot_size', 'N/A'),
+        f"{trade['profit_pips']:.1f}",
+        f"{trade.get('profit_amount', 0):.0f}",
+        trade.get('entry_time', 'N/A'),
+        trade.get('exit_time', 'N/A')
+    ]
+
+def _write_daily_csv(today, rows):
+    """日次結果CSVを大きめのバッファで一括書き出しし、保存先パスを返す"""
     daily_results_dir = 'daily_results'
     if not os.path.exists(daily_results_dir):
         os.makedirs(daily_results_dir)
         logging.info(f"daily_resultsディレクトリを作成しました: {daily_results_dir}")
-    
     filename = os.path.join(daily_results_dir, f'daily_results_{today}.csv')
-    
+    with open(filename, 'w', newline='', encoding='utf-8', buffering=1 << 16) as file:
+        writer = csv.writer(file)
+        writer.writerow(_DAILY_RESULTS_HEADER)
+        # writerows＋ジェネレータでC側のループに全行をまとめて渡す
+        writer.writerows(rows)
+    return filename
+
+def save_daily_results():
+    """日次取引結果をCSVファイルに保存"""
+    global trade_results
+    today = datetime.now().strftime('%Y-%m-%d')
+
     if not trade_results:
         return
-    
+
     try:
-        with open(filename, 'w', newline='', encoding='utf-8') as file:
-            writer = csv.writer(file)
-            writer.writerow(['日付', '通貨ペア', '売買方向', 'エントリー価格', '決済価格', 'ロット数', '損益pips', '損益金額(円)', 'エントリー時刻', '決済時刻'])
-            
-            for trade in trade_results:
-                writer.writerow([
-                    today,
-                    trade['symbol'],
-                    trade['side'],
-                    trade['entry_price'],
-                    trade['exit_price'],
-                    trade.get('lot_size', 'N/A'),
-                    f"{trade['profit_pips']:.1f}",
-                    f"{trade.get('profit_amount', 0):.0f}",
-                    trade.get('entry_time', 'N/A'),
-                    trade.get('exit_time', 'N/A')
-                ])
+        filename = _write_daily_csv(today, (_trade_row(today, trade) for trade in trade_results))
         logging.info(f"日次結果を{filename}に保存しました")
     except Exception as e:
         logging.error(f"日次結果保存エラー: {e}")
@@ -3437,31 +4324,18 @@ def finalize_trades_for_day(target_date):
     today_results = []
     remain_results = []
     for trade in trade_results:
-        # 決済時刻をdatetime型に変換（タイムゾーン処理改善）
-        exit_time_str = trade.get('exit_time')
-        if exit_time_str:
-            try:
-                # 日付情報がなければtarget_dateを使う
-                if 'T' in exit_time_str or '-' in exit_time_str:
-                    # ISO形式の場合
-                    exit_time_str_clean = exit_time_str.replace('Z', '+00:00')
-                    exit_time = datetime.fromisoformat(exit_time_str_clean)
-                else:
-                    # HH:MM:SS形式の場合
-                    time_obj = datetime.strptime(exit_time_str, '%H:%M:%S').time()
-                    exit_time = datetime.combine(target_date, time_obj)
-            except (ValueError, TypeError) as e:
-                logging.error(f"決済時刻変換エラー: {e}, exit_time_str={exit_time_str}")
-                exit_time = cutoff  # エラー時は当日19:00扱い
-        else:
-            exit_time = cutoff  # 万一なければ当日19:00扱い
+        # 決済時刻は記録時にキャッシュされたdatetimeを使う
+        # （旧形式のデータは初回のみ解析。欠損・エラー時は当日19:00扱い）
+        exit_time = _get_exit_dt(trade, cutoff)
         if exit_time < cutoff:
             today_results.append(trade)
         else:
             remain_results.append(trade)
     if not today_results:
         send_discord_message(f"{target_date.strftime('%Y/%m/%d')} 19:00までの取引はありませんでした。")
-        trade_results = remain_results
+        trade_results = deque(remain_results, maxlen=TRADE_RESULTS_MAXLEN)
+        trade_columns.rebuild(trade_results)
+        _rebuild_trades_by_date(trade_results)
         return
     total_profit_pips = sum(trade['profit_pips'] for trade in today_results)
     total_profit_amount = sum(trade.get('profit_amount', 0) for trade in today_results)
@@ -3479,10 +4353,13 @@ def finalize_trades_for_day(target_date):
     except Exception as e:
         logging.error(f"口座残高取得エラー: {e}")
         balance_amount = 0
+    # CSV行を先に組み立て、Discordの表と日次CSVの両方で使い回す
+    today = target_date.strftime('%Y-%m-%d')
+    rows = [_trade_row(today, trade) for trade in today_results]
     table_header = "| 通貨ペア | 売買方向 | エントリー価格 | 決済価格 | ロット数 | 損益pips | 損益金額(円) |\n|---|---|---|---|---|---|---|\n"
     table_rows = "\n".join(
-        f"| {trade['symbol']} | {trade['side']} | {trade['entry_price']} | {trade['exit_price']} | {trade.get('lot_size', 'N/A')} | {trade['profit_pips']:.1f} | {trade.get('profit_amount', 0):.0f} |"
-        for trade in today_results
+        f"| {r[1]} | {r[2]} | {r[3]} | {r[4]} | {r[5]} | {r[6]} | {r[7]} |"
+        for r in rows
     )
     message = (
         f"**{target_date.strftime('%Y/%m/%d')} 19:00までの取引結果**\n\n"
@@ -3493,38 +4370,16 @@ def finalize_trades_for_day(target_date):
         f"**FX口座残高**: {balance_amount}円"
     )
     send_discord_message(message)
-    # 日次結果を保存
-    today = target_date.strftime('%Y-%m-%d')
-    
-    # daily_resultsディレクトリを作成
-    daily_results_dir = 'daily_results'
-    if not os.path.exists(daily_results_dir):
-        os.makedirs(daily_results_dir)
-        logging.info(f"daily_resultsディレクトリを作成しました: {daily_results_dir}")
-    
-    filename = os.path.join(daily_results_dir, f'daily_results_{today}.csv')
+    # 日次結果を保存（Discord表示に使った行をそのまま書き出す）
     try:
-        with open(filename, 'w', newline='', encoding='utf-8') as file:
-            writer = csv.writer(file)
-            writer.writerow(['日付', '通貨ペア', '売買方向', 'エントリー価格', '決済価格', 'ロット数', '損益pips', '損益金額(円)', 'エントリー時刻', '決済時刻'])
-            for trade in today_results:
-                writer.writerow([
-                    today,
-                    trade['symbol'],
-                    trade['side'],
-                    trade['entry_price'],
-                    trade['exit_price'],
-                    trade.get('lot_size', 'N/A'),
-                    f"{trade['profit_pips']:.1f}",
-                    f"{trade.get('profit_amount', 0):.0f}",
-                    trade.get('entry_time', 'N/A'),
-                    trade.get('exit_time', 'N/A')
-                ])
+        filename = _write_daily_csv(today, rows)
         logging.info(f"日次結果を{filename}に保存しました")
     except Exception as e:
         logging.error(f"日次結果保存エラー: {e}")
     # その日分をリセット
-    trade_results = remain_results
+    trade_results = deque(remain_results, maxlen=TRADE_RESULTS_MAXLEN)
+    trade_columns.rebuild(trade_results)
+    _rebuild_trades_by_date(trade_results)
 
 def get_execution_fee(order_id):
     """
@@ -3590,6 +4445,8 @@ def execute_daily_trades():
     
     try:
         # trades.csvから取引指示を読み込む
+        # 読み込み・検証・時刻解析を1パスで行い、解析済みdtimeを行と一緒に保持する
+        # （後段の補正処理で再解析しないため）
         with open(SCHEDULE_CSV, mode='r', encoding='utf-8') as file:
             reader = csv.reader(file)
             header = next(reader)
@@ -3597,11 +4454,11 @@ def execute_daily_trades():
             for row_num, row in enumerate(reader, start=2):  # 行番号を追跡（ヘッダーが1行目）
                 # 空行や不完全な行をスキップ
                 if len(row) >= 6 and row[1].strip() and row[2].strip() and row[3].strip() and row[4].strip():
-                    # 時刻形式の検証
+                    # 時刻形式の検証（strptimeではなくキャッシュ付き高速パーサで行う）
                     try:
-                        datetime.strptime(row[3].strip(), '%H:%M:%S')
-                        datetime.strptime(row[4].strip(), '%H:%M:%S')
-                        trades.append(row)
+                        entry_t = _parse_hms(row[3].strip())
+                        exit_t = _parse_hms(row[4].strip())
+                        trades.append((entry_t, exit_t, row))
                     except ValueError as e:
                         logging.warning(f"行{row_num}: 時刻形式エラー - {row[3]} または {row[4]}: {e}")
                 else:
@@ -3614,74 +4471,84 @@ def execute_daily_trades():
         
         now = datetime.now()
         
-        # 前日の最後の取引時刻を取得（日を跨いだ取引の連続性のため）
-        last_trade_time = None
-        if trade_results:
-            # 前日の取引結果から最後の決済時刻を取得
-            last_trades = [t for t in trade_results if t.get('exit_time')]
-            if last_trades:
-                # 最新の決済時刻を取得
-                last_exit_time_str = max(last_trades, key=lambda x: x.get('exit_time', '')).get('exit_time')
-                if last_exit_time_str:
-                    try:
-                        if 'T' in last_exit_time_str or '-' in last_exit_time_str:
-                            # ISO形式の場合
-                            last_exit_time_str_clean = last_exit_time_str.replace('Z', '+00:00')
-                            last_trade_time = datetime.fromisoformat(last_exit_time_str_clean)
-                        else:
-                            # HH:MM:SS形式の場合（前日の日付を仮定）
-                            time_obj = datetime.strptime(last_exit_time_str, '%H:%M:%S').time()
-                            last_trade_time = datetime.combine(now.date() - timedelta(days=1), time_obj)
-                        logging.info(f"前日の最後の取引時刻: {last_trade_time.strftime('%Y/%m/%d %H:%M:%S')}")
-                    except (ValueError, TypeError) as e:
-                        logging.warning(f"前日の最後の取引時刻取得エラー: {e}")
-        
-        adjusted_trades = []
-        for i, trade in enumerate(trades):
-            try:
-                original_entry_time = datetime.strptime(trade[3].strip(), '%H:%M:%S').replace(year=now.year, month=now.month, day=now.day)
+        # 前日の最後の取引時刻（記録時に更新される追跡値をO(1)で参照）
+        last_trade_time = last_exit_dt
+        if last_trade_time:
+            logging.info(f"前日の最後の取引時刻: {last_trade_time.strftime('%Y/%m/%d %H:%M:%S')}")
+        
+        # 翌日繰り越しの基準時刻（前日の最終決済時刻と現在時刻の遅い方）
+        threshold = max(last_trade_time, now) if last_trade_time else now
+
+        if np is not None and len(trades) >= 10:
+            # 行数が多い場合は全行の時刻補正をdatetime64[s]でまとめて行う
+            n = len(trades)
+            day_ns = np.datetime64(now.date(), 's')
+            entry_secs = np.fromiter(
+                (t.hour * 3600 + t.minute * 60 + t.second for t, _, _ in trades),
+                dtype=np.int64, count=n)
+            exit_secs = np.fromiter(
+                (t.hour * 3600 + t.minute * 60 + t.second for _, t, _ in trades),
+                dtype=np.int64, count=n)
+            entries = day_ns + entry_secs.astype('timedelta64[s]')
+            one_day = np.timedelta64(1, 'D')
+            entries = np.where(
+                entries < np.datetime64(threshold.replace(microsecond=0)), entries + one_day, entries)
+            # 決済時刻は補正後エントリーからの経過秒で導出する（スカラー経路と同じく
+            # エントリーが翌日に繰り越されても追従し、日跨ぎ・同時刻は翌日扱いになる）
+            exit_delta = ((exit_secs - entry_secs - 1) % 86400 + 1).astype('timedelta64[s]')
+            exits = entries + exit_delta
+            order = np.argsort(entries, kind='stable')
+            filtered_trades = []
+            for i in order:
+                entry_time = entries[i].astype(datetime)
+                exit_time = exits[i].astype(datetime)
+                adjusted_trade = trades[i][2].copy()
+                adjusted_trade[3] = entry_time.strftime('%H:%M:%S')
+                adjusted_trade[4] = exit_time.strftime('%H:%M:%S')
+                adjusted_trade.append(entry_time)  # インデックス6に調整済みentry_time
+                adjusted_trade.append(exit_time)   # インデックス7に調整済みexit_time
+                filtered_trades.append(adjusted_trade)
+            logging.info(f"取引時刻の補正をベクトル化パスで実行しました（{n}件、基準時刻 {threshold.strftime('%Y/%m/%d %H:%M:%S')}）")
+        else:
+            adjusted_trades = []
+            for i, (entry_t, exit_t, trade) in enumerate(trades):
+                # 読み込み時に解析済みのdtimeを当日の日付と組み合わせる
+                original_entry_time = datetime.combine(now.date(), entry_t)
                 entry_time = original_entry_time
-            except ValueError as e:
-                logging.error(f"取引{i+1}: エントリー時刻の解析エラー - {trade[3]}: {e}")
-                continue
-            
-            # 前日の最後の取引時刻がある場合、連続性を考慮
-            if last_trade_time and entry_time < last_trade_time:
-                # 前日の最後の取引時刻より前の場合は翌日に設定
-                entry_time = entry_time + timedelta(days=1)
-                logging.info(f"取引{i+1}: 前日の最後の取引時刻({last_trade_time.strftime('%H:%M:%S')})を考慮し、エントリー時刻を翌日に調整: {original_entry_time.strftime('%H:%M:%S')} → {entry_time.strftime('%Y/%m/%d %H:%M:%S')}")
-            elif entry_time < now:
-                # 現在時刻より前の場合は翌日に設定
-                entry_time = entry_time + timedelta(days=1)
-                logging.info(f"取引{i+1}: 現在時刻({now.strftime('%H:%M:%S')})を考慮し、エントリー時刻を翌日に調整: {original_entry_time.strftime('%H:%M:%S')} → {entry_time.strftime('%Y/%m/%d %H:%M:%S')}")
-            else:
-                logging.info(f"取引{i+1}: エントリー時刻をそのまま使用: {entry_time.strftime('%Y/%m/%d %H:%M:%S')}")
-            
-            # 決済時刻も同様に調整
-            try:
-                original_exit_time = datetime.strptime(trade[4].strip(), '%H:%M:%S').replace(year=entry_time.year, month=entry_time.month, day=entry_time.day)
+
+                # 前日の最後の取引時刻がある場合、連続性を考慮
+                if last_trade_time and entry_time < last_trade_time:
+                    # 前日の最後の取引時刻より前の場合は翌日に設定
+                    entry_time = entry_time + timedelta(days=1)
+                    logging.info(f"取引{i+1}: 前日の最後の取引時刻({last_trade_time.strftime('%H:%M:%S')})を考慮し、エントリー時刻を翌日に調整: {original_entry_time.strftime('%H:%M:%S')} → {entry_time.strftime('%Y/%m/%d %H:%M:%S')}")
+                elif entry_time < now:
+                    # 現在時刻より前の場合は翌日に設定
+                    entry_time = entry_time + timedelta(days=1)
+                    logging.info(f"取引{i+1}: 現在時刻({now.strftime('%H:%M:%S')})を考慮し、エントリー時刻を翌日に調整: {original_entry_time.strftime('%H:%M:%S')} → {entry_time.strftime('%Y/%m/%d %H:%M:%S')}")
+                else:
+                    logging.info(f"取引{i+1}: エントリー時刻をそのまま使用: {entry_time.strftime('%Y/%m/%d %H:%M:%S')}")
+
+                # 決済時刻も同様に調整
+                original_exit_time = datetime.combine(entry_time.date(), exit_t)
                 exit_time = original_exit_time
-            except ValueError as e:
-                logging.error(f"取引{i+1}: 決済時刻の解析エラー - {trade[4]}: {e}")
-                continue
-            if exit_time <= entry_time:
-                exit_time = exit_time + timedelta(days=1)
-                logging.info(f"取引{i+1}: 決済時刻を翌日に調整: {original_exit_time.strftime('%H:%M:%S')} → {exit_time.strftime('%Y/%m/%d %H:%M:%S')}")
-            
-            # trade[3]とtrade[4]を書き換えた新リストを作成
-            adjusted_trade = trade.copy()
-            adjusted_trade[3] = entry_time.strftime('%H:%M:%S')
-            adjusted_trade[4] = exit_time.strftime('%H:%M:%S')
-            # 調整済みのdatetimeオブジェクトを追加で保存
-            adjusted_trade.append(entry_time)  # インデックス6に調整済みentry_time
-            adjusted_trade.append(exit_time)   # インデックス7に調整済みexit_time
-            # ソート用にタプルを作成（entry_time, trade）
-            adjusted_trades.append((entry_time, adjusted_trade))
-        
-        # entry_timeでソート
-        adjusted_trades.sort(key=lambda x: x[0])
-        # ソート済みのtradeのみを抽出
-        filtered_trades = [t[1] for t in adjusted_trades]
+                if exit_time <= entry_time:
+                    exit_time = exit_time + timedelta(days=1)
+                    logging.info(f"取引{i+1}: 決済時刻を翌日に調整: {original_exit_time.strftime('%H:%M:%S')} → {exit_time.strftime('%Y/%m/%d %H:%M:%S')}")
+
+                # trade[3]とtrade[4]を書き換えた新リストを作成
+                adjusted_trade = trade.copy()
+                adjusted_trade[3] = entry_time.strftime('%H:%M:%S')
+                adjusted_trade[4] = exit_time.strftime('%H:%M:%S')
+                # 調整済みのdatetimeオブジェクトを追加で保存
+                adjusted_trade.append(entry_time)  # インデックス6に調整済みentry_time
+                adjusted_trade.append(exit_time)   # インデックス7に調整済みexit_time
+                # ソート用にタプルを作成（entry_time, trade）
+                adjusted_trades.append((entry_time, adjusted_trade))
+
+            # entry_timeでソート
+            adjusted_trades.sort(key=itemgetter(0))
+            # ソート済みのtradeのみを抽出
+            filtered_trades = [t[1] for t in adjusted_trades]
 
         # 口座残高を取得
         try:
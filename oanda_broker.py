@@ -10,14 +10,69 @@ Uses direct HTTP requests for better control and latest API features.
 """
 
 import requests
+from urllib3.util.retry import Retry
 import json
 import logging
 import time
-from typing import Optional, List, Dict, Any
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # orjson未導入環境では標準jsonでパースする
+from typing import Optional, List, Dict, Any, Tuple
 from datetime import datetime
 
 from broker_base import BrokerBase, Balance, Order, Position, Ticker
 
+logger = logging.getLogger(__name__)
+
+# ポジション解析で欠損side用に使い回す空dict（毎回 {} を生成しない）
+_EMPTY = {}
+# 気配値が欠損したPRICEメッセージ用のタプルセンチネル
+_EMPTY_QUOTES = ({},)
+
+
+class SlidingWindowLimiter:
+    """
+    スライディングウィンドウ方式のレートリミッター（スレッドセーフ）
+
+    直近window秒間のリクエスト時刻をdequeで保持し、どの60秒区間でも
+    limit件を超えないことを保証する。トークンバケットや固定カウンターと
+    違い、区間境界をまたぐ2倍バーストが原理的に発生しない
+    """
+
+    def __init__(self, limit: int, window: float = 60.0):
+        self.limit = limit
+        self.window = window
+        self._times = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """リクエスト枠を1件取得する（枠が空くまでsleep）"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                cutoff = now - self.window
+                times = self._times
+                while times and times[0] < cutoff:
+                    times.popleft()
+                if len(times) < self.limit:
+                    times.append(now)
+                    return
+                # 最古のリクエストがウィンドウから外れるまでの時間
+                wait = times[0] + self.window - now
+            time.sleep(wait)
+
+    def penalize(self):
+        """429受信時にウィンドウを埋め、サーバー側の制限と再同期する"""
+        with self._lock:
+            now = time.monotonic()
+            while len(self._times) < self.limit:
+                self._times.append(now)
+
 
 class OANDABroker(BrokerBase):
     """
@@ -25,6 +80,9 @@ class OANDABroker(BrokerBase):
     最新のOANDA API v20仕様に準拠
     """
 
+    # ETagキャッシュの上限件数（ポーリング対象のGETエンドポイント数で十分）
+    _ETAG_CACHE_MAX = 32
+
     def __init__(self, config: Dict[str, Any]):
         """
         初期化
@@ -38,98 +96,242 @@ class OANDABroker(BrokerBase):
         self.account_id = config.get('oanda_account_id', '')
         self.access_token = config.get('oanda_access_token', '')
         self.environment = config.get('oanda_environment', 'practice')  # 'practice' or 'live'
+        # ホットパスでの環境判定用に文字列比較の結果をキャッシュしておく
+        self._is_live = self.environment == 'live'
 
         # API エンドポイント設定
-        if self.environment == 'live':
+        if self._is_live:
             self.base_url = "https://api-fxtrade.oanda.com/v3"
+            self.stream_url = "https://stream-fxtrade.oanda.com/v3"
         else:
             self.base_url = "https://api-fxpractice.oanda.com/v3"
+            self.stream_url = "https://stream-fxpractice.oanda.com/v3"
 
-        # HTTPセッション
+        # HTTPセッション（keep-aliveでTCP/TLSハンドシェイクを再利用）
+        # 並列決済・スナップショット取得がスレッドから同時に呼ぶため、
+        # プールサイズを明示しておく（デフォルトだと溢れた接続は破棄される）
+        # 一時的なサーバーエラーはアダプタ層でバックオフ付き再試行する
+        # （Retryのデフォルト対象はべき等メソッドのみで、POST注文は再送されない）
         self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=16, pool_maxsize=32,
+            max_retries=Retry(total=3, backoff_factor=0.3,
+                              status_forcelist=[429, 502, 503, 504]))
+        self.session.mount('https://', adapter)
         self.session.headers.update({
             'Authorization': f'Bearer {self.access_token}',
             'Content-Type': 'application/json',
             'Accept': 'application/json'
         })
 
-        # レート制限管理 (120回/分)
-        self.last_request_time = 0
-        self.request_count = 0
-        self.current_rate_limit = 120
+        # アカウントIDを含むエンドポイントパスは固定なので一度だけ組み立てる
+        # （ポーリングの度にf-stringを再構築しない）
+        self._ep_account = f'/accounts/{self.account_id}'
+        self._ep_orders = f'/accounts/{self.account_id}/orders'
+        self._ep_positions = f'/accounts/{self.account_id}/positions'
+        self._ep_pricing = f'/accounts/{self.account_id}/pricing'
+        self._ep_trades = f'/accounts/{self.account_id}/trades'
+        self._ep_transactions = f'/accounts/{self.account_id}/transactions'
+
+        # 約定情報キャッシュ: order_id -> (取得時刻, ORDER_FILLトランザクション)
+        self._execution_cache = {}
+
+        # 条件付きGET用のETagキャッシュ: (endpoint, params) -> (ETag, 解析済みボディ)
+        self._etag_cache = {}
+
+        # ポジション一覧の生レスポンスキャッシュ: (取得時刻, レスポンス)
+        # 監視ループが銘柄ごとに照会しても同じGETを繰り返さないようにする
+        self._positions_cache = (0.0, None)
+        self._positions_cache_lock = threading.Lock()
+        # position_id -> Position の索引（get_all_positionsの解析時に構築）
+        self._position_by_id = {}
+        # スナップショットごとに1回だけ解析したPositionリスト（キャッシュヒット時に再利用）
+        self._positions_parsed = None
+
+        # 独立API呼び出しを並行実行するための共有スレッドプール
+        # （残高・ポジション・価格の取得は互いに依存しないためRTTを重ねられる）
+        self._executor = ThreadPoolExecutor(max_workers=8,
+                                            thread_name_prefix=f"oanda-{self.name}")
+
+        # レート制限管理 (どの60秒区間でも120回を超えない)
+        self._rate_limiter = SlidingWindowLimiter(limit=120, window=60.0)
+
+        # single-flight: 同一GETが同時に走ったら1本に束ね、結果を共有する
+        # key -> [Event, 結果]
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+
+        # 通貨ペア表記の変換テーブル（内部形式 <-> OANDA形式、参照時に埋める）
+        # ホットループでのstr.replaceと文字列生成を1回きりにする
+        self._to_oanda = {}
+        self._from_oanda = {}
+
+        # ストリーミング価格: symbol -> Ticker（ストリーム受信スレッドが更新）
+        self._stream_tickers = {}
+        self._stream_lock = threading.Lock()
+        self._stream_thread = None
+        self._stream_stop = threading.Event()
+
+        # 設定不備は最初のAPI呼び出しまで待たず、構築時点で失敗させる
+        if not self.validate_config():
+            raise ValueError(
+                "Invalid OANDA config: account_id/access_token/environmentを確認してください")
+
+    def _to_oanda_sym(self, symbol: str) -> str:
+        """内部形式(USD_JPY)をOANDA形式に変換する（結果はキャッシュ）"""
+        cached = self._to_oanda.get(symbol)
+        if cached is None:
+            cached = self._to_oanda[symbol] = symbol.replace('_', '/')
+        return cached
+
+    def _from_oanda_sym(self, oanda_symbol: str) -> str:
+        """OANDA形式を内部形式(USD_JPY)に変換する（結果はキャッシュ）"""
+        cached = self._from_oanda.get(oanda_symbol)
+        if cached is None:
+            cached = self._from_oanda[oanda_symbol] = oanda_symbol.replace('/', '_')
+        return cached
 
-    def _rate_limit_wait(self):
-        """レート制限を管理する"""
-        current_time = time.time()
-        time_diff = current_time - self.last_request_time
+    def _make_request(self, method: str, endpoint: str, data: Optional[Dict] = None) -> Optional[Dict]:
+        """
+        APIリクエストを実行する
 
-        # 1分ごとにカウンターをリセット
-        if time_diff >= 60:
-            self.request_count = 0
-            self.last_request_time = current_time
+        GETはsingle-flightで束ねる: 同一エンドポイント・同一パラメータの
+        リクエストが同時に飛んだ場合、先行の1本だけが実際に送信され、
+        後続はその結果を共有する（べき等でないPOST/PUT等は対象外）
+        """
+        if method == 'GET':
+            key = (endpoint, tuple(sorted(data.items())) if data else None)
+            with self._inflight_lock:
+                entry = self._inflight.get(key)
+                if entry is not None:
+                    leader = False
+                else:
+                    entry = [threading.Event(), None]
+                    self._inflight[key] = entry
+                    leader = True
+            if not leader:
+                # 先行リクエストの完了を待って結果を使い回す
+                entry[0].wait(60)
+                return entry[1]
+            try:
+                entry[1] = self._do_request(method, endpoint, data)
+                return entry[1]
+            finally:
+                with self._inflight_lock:
+                    self._inflight.pop(key, None)
+                entry[0].set()
 
-        # レート制限チェック
-        if self.request_count >= self.current_rate_limit:
-            wait_time = 60 - time_diff
-            if wait_time > 0:
-                logging.info(f"[{self.name}] レート制限待機中: {wait_time:.1f}秒")
-                time.sleep(wait_time)
-            self.request_count = 0
+        return self._do_request(method, endpoint, data)
 
-        self.request_count += 1
+    def _do_request(self, method: str, endpoint: str, data: Optional[Dict] = None) -> Optional[Dict]:
+        """HTTPリクエストの実体（レート制限・条件付きGET・送信・パース）"""
+        url = f"{self.base_url}{endpoint}"
 
-    def _make_request(self, method: str, endpoint: str, data: Optional[Dict] = None) -> Optional[Dict]:
-        """APIリクエストを実行する"""
-        self._rate_limit_wait()
+        # ボディのJSONエンコードはレート制限の待機前に済ませておく
+        # （枠を取ってから送信までの遅延を最小にする。orjsonがあれば高速化）
+        body = None
+        if data is not None and method in ('POST', 'PUT'):
+            if orjson is not None:
+                body = orjson.dumps(data)
+            else:
+                body = json.dumps(data).encode('utf-8')
 
-        url = f"{self.base_url}{endpoint}"
+        # GETはETagによる条件付きリクエストにする
+        # （変化がなければ304の空ボディで済み、転送・パースを省ける）
+        etag_key = None
+        etag_entry = None
+        headers = None
+        if method == 'GET':
+            etag_key = (endpoint, tuple(sorted(data.items())) if data else None)
+            etag_entry = self._etag_cache.get(etag_key)
+            if etag_entry is not None:
+                headers = {'If-None-Match': etag_entry[0]}
+
+        self._rate_limiter.acquire()
 
         try:
             if method == 'GET':
-                response = self.session.get(url, params=data, timeout=30)
+                response = self.session.get(url, params=data, headers=headers, timeout=30)
             elif method == 'POST':
-                response = self.session.post(url, json=data, timeout=30)
+                response = self.session.post(url, data=body, timeout=30)
             elif method == 'PUT':
-                response = self.session.put(url, json=data, timeout=30)
+                response = self.session.put(url, data=body, timeout=30)
             elif method == 'DELETE':
                 response = self.session.delete(url, timeout=30)
             else:
                 raise ValueError(f"Unsupported HTTP method: {method}")
 
+            if response.status_code == 429:
+                # サーバー側の制限に先行されたらバケットを負に落として追従する
+                self._rate_limiter.penalize()
+                logger.warning("[%s] レート制限超過(429)を受信しました: %s", self.name, endpoint)
+
+            if response.status_code == 304 and etag_entry is not None:
+                # 前回から変化なし: キャッシュ済みの解析結果をそのまま返す
+                return etag_entry[1]
+
             response.raise_for_status()
-            return response.json()
+            # orjsonがあれば高速パース（大きなレスポンスで2-5倍程度速い）
+            if orjson is not None:
+                result = orjson.loads(response.content)
+            else:
+                result = response.json()
+
+            if etag_key is not None:
+                etag = response.headers.get('ETag')
+                if etag:
+                    if etag_key not in self._etag_cache and \
+                            len(self._etag_cache) >= self._ETAG_CACHE_MAX:
+                        # 挿入順で最も古いエントリを追い出す
+                        self._etag_cache.pop(next(iter(self._etag_cache)))
+                    self._etag_cache[etag_key] = (etag, result)
+
+            return result
 
         except requests.exceptions.RequestException as e:
-            logging.error(f"[{self.name}] APIリクエストエラー: {e}")
+            logger.error("[%s] APIリクエストエラー: %s", self.name, e)
             return None
         except json.JSONDecodeError as e:
-            logging.error(f"[{self.name}] JSONパースエラー: {e}")
+            logger.error("[%s] JSONパースエラー: %s", self.name, e)
             return None
 
+    def _parse_trade(self, trade: List[str]) -> Optional[Tuple[str, str, Optional[float]]]:
+        """
+        トレードデータを検証して (symbol, side, size) に展開する
+
+        例外に頼らず明示的に検証し、不正データはNoneで早期に弾く
+        （entry/exitの外側try/exceptは注文系の呼び出しだけに限定できる）
+        """
+        if len(trade) < 5:
+            logger.error("[%s] 無効なトレードデータ: %s", self.name, trade)
+            return None
+
+        symbol, side, size_str = trade[2], trade[3], trade[4]
+
+        try:
+            size = float(size_str) if size_str else None
+        except ValueError:
+            logger.error("[%s] 無効なサイズ: %s", self.name, size_str)
+            return None
+
+        return symbol, side, size
+
     def entry(self, trade: List[str]) -> bool:
         """
         OANDAでエントリー注文を実行
-        
+
         Args:
             trade: トレードデータ [date, time, symbol, side, size, entry_time, exit_time]
-            
+
         Returns:
             bool: 成功時はTrue
         """
+        parsed = self._parse_trade(trade)
+        if parsed is None:
+            return False
+        symbol, side, size = parsed
+
         try:
-            if len(trade) < 5:
-                logging.error(f"[{self.name}] 無効なトレードデータ: {trade}")
-                return False
-            
-            date, time_str, symbol, side, size_str = trade[:5]
-            
-            # サイズを数値に変換
-            try:
-                size = float(size_str) if size_str else None
-            except ValueError:
-                logging.error(f"[{self.name}] 無効なサイズ: {size_str}")
-                return False
-            
             # エントリー注文実行
             order = self.create_order(symbol, side, size, self.leverage)
             
@@ -138,18 +340,18 @@ class OANDABroker(BrokerBase):
                 msg = f"エントリー注文実行: {symbol} {side} {size}ロット"
                 self.notify(msg)
                 
-                logging.info(f"[{self.name}] エントリー注文成功: {symbol} {side} {size}ロット")
+                logger.info(f"[{self.name}] エントリー注文成功: {symbol} {side} {size}ロット")
                 return True
             else:
                 error_msg = f"エントリー注文失敗: {symbol} {side} {size}ロット"
                 self.notify(error_msg)
-                logging.error(f"[{self.name}] {error_msg}")
+                logger.error("[%s] %s", self.name, error_msg)
                 return False
                 
         except Exception as e:
             error_msg = f"エントリー処理エラー: {e}"
             self.notify(error_msg)
-            logging.error(f"[{self.name}] {error_msg}")
+            logger.error("[%s] %s", self.name, error_msg)
             return False
     
     def exit(self, trade: List[str]) -> bool:
@@ -162,27 +364,19 @@ class OANDABroker(BrokerBase):
         Returns:
             bool: 成功時はTrue
         """
+        parsed = self._parse_trade(trade)
+        if parsed is None:
+            return False
+        symbol, side, size = parsed
+
         try:
-            if len(trade) < 5:
-                logging.error(f"[{self.name}] 無効なトレードデータ: {trade}")
-                return False
-            
-            date, time_str, symbol, side, size_str = trade[:5]
-            
-            # サイズを数値に変換
-            try:
-                size = float(size_str) if size_str else None
-            except ValueError:
-                logging.error(f"[{self.name}] 無効なサイズ: {size_str}")
-                return False
-            
             # 現在のポジションを取得
             positions = self.check_current_positions(symbol)
             
             if not positions:
                 msg = f"決済対象ポジションなし: {symbol}"
                 self.notify(msg)
-                logging.warning(f"[{self.name}] {msg}")
+                logger.warning("[%s] %s", self.name, msg)
                 return True  # ポジションがない場合は成功として扱う
             
             # 決済方向を決定（エントリーと逆方向）
@@ -204,11 +398,11 @@ class OANDABroker(BrokerBase):
                         msg = f"決済完了: {symbol} {position.size}ロット 損益: {profit_pips}pips (¥{profit_amount})"
                         self.notify(msg)
                         
-                        logging.info(f"[{self.name}] 決済成功: {symbol} 損益: {profit_pips}pips (¥{profit_amount})")
+                        logger.info(f"[{self.name}] 決済成功: {symbol} 損益: {profit_pips}pips (¥{profit_amount})")
                     else:
                         error_msg = f"決済失敗: {symbol} {position.size}ロット"
                         self.notify(error_msg)
-                        logging.error(f"[{self.name}] {error_msg}")
+                        logger.error("[%s] %s", self.name, error_msg)
             
             if success_count > 0:
                 return True
@@ -218,13 +412,13 @@ class OANDABroker(BrokerBase):
         except Exception as e:
             error_msg = f"決済処理エラー: {e}"
             self.notify(error_msg)
-            logging.error(f"[{self.name}] {error_msg}")
+            logger.error("[%s] %s", self.name, error_msg)
             return False
     
     def get_balance(self) -> Optional[Balance]:
         """口座残高を取得"""
         try:
-            response = self._make_request('GET', f'/accounts/{self.account_id}')
+            response = self._make_request('GET', self._ep_account)
 
             if response and 'account' in response:
                 account = response['account']
@@ -238,7 +432,7 @@ class OANDABroker(BrokerBase):
             return None
 
         except Exception as e:
-            logging.error(f"[{self.name}] 残高取得エラー: {e}")
+            logger.error("[%s] 残高取得エラー: %s", self.name, e)
             return None
     
     def create_order(self, symbol: str, side: str, size: Optional[float] = None,
@@ -246,14 +440,15 @@ class OANDABroker(BrokerBase):
         """注文を作成"""
         try:
             # OANDAの通貨ペア形式に変換
-            oanda_symbol = symbol.replace('_', '/')
+            oanda_symbol = self._to_oanda_sym(symbol)
 
             # デフォルトサイズ設定
             if size is None:
                 size = 1000  # デフォルト1000ユニット
 
-            # サイド変換 (BUY/SELL -> ユニット数)
-            if side.upper() == 'SELL':
+            # サイド変換 (BUY/SELL -> ユニット数)。大文字化は1回だけ行う
+            side_upper = side.upper()
+            if side_upper == 'SELL':
                 units = -int(size)
             else:
                 units = int(size)
@@ -268,14 +463,16 @@ class OANDABroker(BrokerBase):
                 }
             }
 
-            response = self._make_request('POST', f'/accounts/{self.account_id}/orders', order_data)
+            response = self._make_request('POST', self._ep_orders, order_data)
 
-            if response and 'orderFillTransaction' in response:
-                order_fill = response['orderFillTransaction']
+            # 成功パスのハッシュ探索を1回に（inチェック+添字参照を.getに統合）
+            order_fill = response.get('orderFillTransaction') if response else None
+            if order_fill is not None:
+                self._invalidate_positions_cache()  # 約定によりポジションが変化した
                 return Order(
                     order_id=order_fill.get('id', ''),
                     symbol=oanda_symbol,
-                    side=side.upper(),
+                    side=side_upper,
                     size=abs(float(order_fill.get('units', 0))),
                     price=float(order_fill.get('price', 0)),
                     status="FILLED"
@@ -284,189 +481,361 @@ class OANDABroker(BrokerBase):
             return None
 
         except Exception as e:
-            logging.error(f"[{self.name}] 注文作成エラー: {e}")
+            logger.error("[%s] 注文作成エラー: %s", self.name, e)
             return None
     
     def close_position(self, symbol: str, position_id: str, size: float, side: str) -> Optional[float]:
-        """ポジションを決済"""
+        """
+        ポジションを決済
+
+        v20ネイティブの /positions/{instrument}/close を使う。
+        REDUCE_ONLY成行注文と違い、符号反転や事前のサイズ確認が不要で
+        1往復で確実に対象サイドだけが縮小される。
+        sideには決済対象ポジションのサイド（BUY=ロング）を渡す
+        """
         try:
-            # OANDAの通貨ペア形式に変換
-            oanda_symbol = symbol.replace('_', '/')
+            # URLパスに入れる銘柄識別子はアンダースコア形式に正規化する
+            # （スラッシュ形式はパス区切りと衝突してルートが壊れる）
+            instrument = symbol.replace('/', '_')
 
-            # 決済用のユニット数を決定
+            # 決済対象サイドのユニット数のみ指定する
             if side.upper() == 'BUY':
-                # ロングポジションを決済（売り）
-                units = -int(size)
+                close_data = {"longUnits": str(int(size))}
             else:
-                # ショートポジションを決済（買い）
-                units = int(size)
-
-            # 決済注文データ作成
-            order_data = {
-                "order": {
-                    "type": "MARKET",
-                    "instrument": oanda_symbol,
-                    "units": units,
-                    "timeInForce": "FOK",
-                    "positionFill": "REDUCE_ONLY"  # ポジションを減らすのみ
-                }
-            }
+                close_data = {"shortUnits": str(int(size))}
 
-            response = self._make_request('POST', f'/accounts/{self.account_id}/orders', order_data)
+            response = self._make_request(
+                'PUT', f'{self._ep_positions}/{instrument}/close', close_data)
 
-            if response and 'orderFillTransaction' in response:
-                order_fill = response['orderFillTransaction']
-                return float(order_fill.get('price', 0))
+            # 約定はサイドに応じたキーで返る
+            fill = None
+            if response:
+                fill = (response.get('longOrderFillTransaction')
+                        or response.get('shortOrderFillTransaction'))
+            if fill is not None:
+                self._invalidate_positions_cache()  # 決済によりポジションが変化した
+                return float(fill.get('price', 0))
 
             return None
 
         except Exception as e:
-            logging.error(f"[{self.name}] 決済エラー: {e}")
+            logger.error("[%s] 決済エラー: %s", self.name, e)
             return None
     
+    def start_pricing_stream(self, symbols: List[str]):
+        """
+        ストリーミング価格の受信を開始する
+
+        OANDAのpricing/streamエンドポイントへ持続接続し、配信された
+        PRICEメッセージでティッカーキャッシュを更新し続ける。開始後は
+        get_tickersがHTTPポーリングなしでキャッシュから応答できる
+        """
+        if self._stream_thread is not None and self._stream_thread.is_alive():
+            return
+
+        instruments = ','.join(self._to_oanda_sym(s) for s in symbols)
+
+        def _run():
+            url = f"{self.stream_url}/accounts/{self.account_id}/pricing/stream"
+            loads = orjson.loads if orjson is not None else json.loads
+            while not self._stream_stop.is_set():
+                try:
+                    with self.session.get(url, params={'instruments': instruments},
+                                          stream=True, timeout=(10, 70)) as resp:
+                        resp.raise_for_status()
+                        for line in resp.iter_lines():
+                            if self._stream_stop.is_set():
+                                return
+                            if not line:
+                                continue
+                            msg = loads(line)
+                            if msg.get('type') != 'PRICE':
+                                continue  # HEARTBEAT等は読み捨てる
+                            internal_symbol = self._from_oanda_sym(msg.get('instrument', ''))
+                            bids = msg.get('bids') or _EMPTY_QUOTES
+                            asks = msg.get('asks') or _EMPTY_QUOTES
+                            ticker = Ticker(
+                                symbol=internal_symbol,
+                                bid=float(bids[0].get('price') or 0),
+                                ask=float(asks[0].get('price') or 0),
+                                timestamp=msg.get('time', '')
+                            )
+                            with self._stream_lock:
+                                self._stream_tickers[internal_symbol] = ticker
+                except Exception as e:
+                    logger.error("[%s] 価格ストリームエラー（5秒後に再接続）: %s", self.name, e)
+                    if self._stream_stop.wait(5):
+                        return
+
+        self._stream_thread = threading.Thread(
+            target=_run, daemon=True, name=f"oanda-stream-{self.name}")
+        self._stream_thread.start()
+        logger.info(f"[{self.name}] 価格ストリームを開始しました: {instruments}")
+
+    def stop_pricing_stream(self):
+        """ストリーミング価格の受信を停止する"""
+        self._stream_stop.set()
+
+    def close(self):
+        """HTTPセッション・ストリーム・スレッドプールを明示的に解放する"""
+        try:
+            self.stop_pricing_stream()
+            self._executor.shutdown(wait=False)
+            self.session.close()
+        except Exception as e:
+            logger.error("[%s] ブローカー終了処理エラー: %s", self.name, e)
+
     def get_tickers(self, symbols: List[str]) -> Optional[Dict[str, Ticker]]:
         """ティッカー情報を取得"""
         try:
             tickers = {}
 
+            # ストリームが動いていれば受信済みキャッシュから即答する（HTTP往復なし）
+            if self._stream_thread is not None and self._stream_thread.is_alive():
+                with self._stream_lock:
+                    streamed = {s: self._stream_tickers[s] for s in symbols
+                                if s in self._stream_tickers}
+                if len(streamed) == len(symbols):
+                    return streamed
+                # 未配信の銘柄が残っている間はRESTにフォールバック
+
             # OANDAの通貨ペア形式に変換
-            oanda_symbols = [symbol.replace('_', '/') for symbol in symbols]
+            oanda_symbols = [self._to_oanda_sym(symbol) for symbol in symbols]
             instruments = ','.join(oanda_symbols)
 
             params = {'instruments': instruments}
-            response = self._make_request('GET', f'/accounts/{self.account_id}/pricing', params)
+            response = self._make_request('GET', self._ep_pricing, params)
 
             if response and 'prices' in response:
                 for price_data in response['prices']:
                     oanda_symbol = price_data.get('instrument', '')
                     # 内部形式に戻す
-                    internal_symbol = oanda_symbol.replace('/', '_')
+                    internal_symbol = self._from_oanda_sym(oanda_symbol)
 
-                    if 'bids' in price_data and 'asks' in price_data:
+                    # 気配値は一度だけ引き、欠損時は共有センチネルで埋める
+                    bids = price_data.get('bids') or _EMPTY_QUOTES
+                    asks = price_data.get('asks') or _EMPTY_QUOTES
+                    if bids is not _EMPTY_QUOTES and asks is not _EMPTY_QUOTES:
                         tickers[internal_symbol] = Ticker(
                             symbol=internal_symbol,
-                            bid=float(price_data['bids'][0]['price']),
-                            ask=float(price_data['asks'][0]['price']),
+                            bid=float(bids[0].get('price') or 0),
+                            ask=float(asks[0].get('price') or 0),
                             timestamp=price_data.get('time', '')
                         )
 
+            # レスポンスに含まれなかった銘柄はNoneで埋め、呼び出し側が欠損を検知できるようにする
+            for symbol in symbols:
+                if symbol not in tickers:
+                    logger.warning("[%s] ティッカー応答に含まれない銘柄: %s", self.name, symbol)
+                    tickers[symbol] = None
+
             return tickers
 
         except Exception as e:
-            logging.error(f"[{self.name}] ティッカー取得エラー: {e}")
+            logger.error("[%s] ティッカー取得エラー: %s", self.name, e)
             return None
     
+    # ポジションキャッシュのTTL（秒）。状態変更系の呼び出しで無効化する
+    _POSITIONS_CACHE_TTL = 1.0
+
+    def _get_positions_cached(self) -> Optional[Dict]:
+        """ポジション一覧の生レスポンスを取得する（短TTLキャッシュ付き）"""
+        now = time.time()
+        with self._positions_cache_lock:
+            ts, cached = self._positions_cache
+            if cached is not None and now - ts < self._POSITIONS_CACHE_TTL:
+                return cached
+
+        response = self._make_request('GET', self._ep_positions)
+        if response is not None:
+            with self._positions_cache_lock:
+                self._positions_cache = (now, response)
+                self._positions_parsed = None  # 新しいスナップショットなので解析結果を破棄
+        return response
+
+    def _invalidate_positions_cache(self):
+        """注文・決済の成功後にポジションキャッシュと索引を破棄する"""
+        with self._positions_cache_lock:
+            self._positions_cache = (0.0, None)
+            self._positions_parsed = None
+        self._position_by_id = {}
+
+    def get_snapshot(self, symbols: List[str]) -> Dict[str, Any]:
+        """
+        残高・全ポジション・ティッカーをまとめて取得する
+
+        3つのAPI呼び出しは互いに依存しないため、共有スレッドプールで
+        並行実行し、所要時間を sum(RTT) から max(RTT) に短縮する
+
+        Args:
+            symbols: ティッカーを取得する通貨ペアのリスト
+
+        Returns:
+            Dict[str, Any]: {'balance': Balance, 'positions': List[Position],
+                             'tickers': Dict[str, Ticker]}（失敗した項目はNone/空）
+        """
+        balance_f = self._executor.submit(self.get_balance)
+        positions_f = self._executor.submit(self.get_all_positions)
+        tickers_f = self._executor.submit(self.get_tickers, symbols)
+        wait([balance_f, positions_f, tickers_f])
+
+        snapshot = {}
+        for key, future in (('balance', balance_f),
+                            ('positions', positions_f),
+                            ('tickers', tickers_f)):
+            try:
+                snapshot[key] = future.result()
+            except Exception as e:
+                logger.error("[%s] スナップショット取得エラー (%s): %s", self.name, key, e)
+                snapshot[key] = None
+        return snapshot
+
+    def get_positions_with_prices(self) -> List[tuple]:
+        """
+        全ポジションと対応する現在価格をまとめて取得する
+
+        ポジション取得と価格一括取得を並行実行して往復を重ね、
+        時価評価に必要な (Position, Ticker) の組を一度で返す
+        （価格が取れなかった銘柄のTickerはNone）
+        """
+        positions = self.get_all_positions()
+        if not positions:
+            return []
+
+        symbols = list({p.symbol for p in positions})
+        tickers = self.get_tickers(symbols) or {}
+        return [(p, tickers.get(p.symbol)) for p in positions]
+
     def check_current_positions(self, symbol: str) -> List[Position]:
         """現在のポジションを取得"""
         try:
             # OANDAの通貨ペア形式に変換
-            oanda_symbol = symbol.replace('_', '/')
+            oanda_symbol = self._to_oanda_sym(symbol)
 
-            response = self._make_request('GET', f'/accounts/{self.account_id}/positions')
+            response = self._get_positions_cached()
 
             positions_list = []
             if response and 'positions' in response:
+                # ホットな解析ループなのでグローバル参照をローカルに束ねる
+                _float, _Position = float, Position
                 for pos_data in response['positions']:
                     if pos_data.get('instrument') == oanda_symbol:
-                        long_data = pos_data.get('long', {})
-                        short_data = pos_data.get('short', {})
+                        long_data = pos_data.get('long') or _EMPTY
+                        short_data = pos_data.get('short') or _EMPTY
 
-                        long_units = float(long_data.get('units', 0))
-                        short_units = float(short_data.get('units', 0))
+                        long_units = _float(long_data.get('units', 0))
+                        short_units = _float(short_data.get('units', 0))
 
                         if long_units > 0:
-                            positions_list.append(Position(
+                            positions_list.append(_Position(
                                 position_id=long_data.get('tradeIDs', [''])[0] if long_data.get('tradeIDs') else '',
                                 symbol=symbol,
                                 side="BUY",
                                 size=long_units,
-                                price=float(long_data.get('averagePrice', 0)),
+                                price=_float(long_data.get('averagePrice', 0)),
                                 open_time=long_data.get('openTime', ''),
-                                unrealized_pnl=float(long_data.get('unrealizedPL', 0))
+                                unrealized_pnl=_float(long_data.get('unrealizedPL', 0))
                             ))
 
                         if short_units > 0:
-                            positions_list.append(Position(
+                            positions_list.append(_Position(
                                 position_id=short_data.get('tradeIDs', [''])[0] if short_data.get('tradeIDs') else '',
                                 symbol=symbol,
                                 side="SELL",
                                 size=short_units,
-                                price=float(short_data.get('averagePrice', 0)),
+                                price=_float(short_data.get('averagePrice', 0)),
                                 open_time=short_data.get('openTime', ''),
-                                unrealized_pnl=float(short_data.get('unrealizedPL', 0))
+                                unrealized_pnl=_float(short_data.get('unrealizedPL', 0))
                             ))
 
             return positions_list
 
         except Exception as e:
-            logging.error(f"[{self.name}] ポジションチェックエラー: {e}")
+            logger.error("[%s] ポジションチェックエラー: %s", self.name, e)
             return []
     
     def get_all_positions(self) -> List[Position]:
         """全ポジションを取得"""
         try:
-            response = self._make_request('GET', f'/accounts/{self.account_id}/positions')
+            response = self._get_positions_cached()
+
+            # 同一スナップショットに対する解析結果はメモ化して再利用する
+            # （TTL内の連続呼び出しでPositionオブジェクトを再生成しない）
+            parsed = self._positions_parsed
+            if parsed is not None:
+                return parsed
 
             positions_list = []
             if response and 'positions' in response:
+                # ホットな解析ループなのでグローバル参照をローカルに束ねる
+                _float, _Position = float, Position
                 for pos_data in response['positions']:
                     oanda_symbol = pos_data.get('instrument', '')
-                    symbol = oanda_symbol.replace('/', '_')  # 内部形式に変換
+                    symbol = self._from_oanda_sym(oanda_symbol)  # 内部形式に変換
 
-                    long_data = pos_data.get('long', {})
-                    short_data = pos_data.get('short', {})
+                    long_data = pos_data.get('long') or _EMPTY
+                    short_data = pos_data.get('short') or _EMPTY
 
-                    long_units = float(long_data.get('units', 0))
-                    short_units = float(short_data.get('units', 0))
+                    long_units = _float(long_data.get('units', 0))
+                    short_units = _float(short_data.get('units', 0))
 
                     if long_units > 0:
-                        positions_list.append(Position(
+                        positions_list.append(_Position(
                             position_id=long_data.get('tradeIDs', [''])[0] if long_data.get('tradeIDs') else '',
                             symbol=symbol,
                             side="BUY",
                             size=long_units,
-                            price=float(long_data.get('averagePrice', 0)),
+                            price=_float(long_data.get('averagePrice', 0)),
                             open_time=long_data.get('openTime', ''),
-                            unrealized_pnl=float(long_data.get('unrealizedPL', 0))
+                            unrealized_pnl=_float(long_data.get('unrealizedPL', 0))
                         ))
 
                     if short_units > 0:
-                        positions_list.append(Position(
+                        positions_list.append(_Position(
                             position_id=short_data.get('tradeIDs', [''])[0] if short_data.get('tradeIDs') else '',
                             symbol=symbol,
                             side="SELL",
                             size=short_units,
-                            price=float(short_data.get('averagePrice', 0)),
+                            price=_float(short_data.get('averagePrice', 0)),
                             open_time=short_data.get('openTime', ''),
-                            unrealized_pnl=float(short_data.get('unrealizedPL', 0))
+                            unrealized_pnl=_float(short_data.get('unrealizedPL', 0))
                         ))
 
+            # ID索引を更新し、注文ID起点のルックアップをO(1)にする
+            self._position_by_id = {p.position_id: p for p in positions_list
+                                    if p.position_id}
+            self._positions_parsed = positions_list
             return positions_list
 
         except Exception as e:
-            logging.error(f"[{self.name}] 全ポジション取得エラー: {e}")
+            logger.error("[%s] 全ポジション取得エラー: %s", self.name, e)
             return []
     
     def get_position_by_order_id(self, order_data: List[Dict[str, Any]]) -> Optional[Position]:
         """注文IDからポジション情報を取得"""
         try:
             if not order_data or not isinstance(order_data, list) or len(order_data) == 0:
-                logging.error("無効な注文データ形式")
+                logger.error("無効な注文データ形式")
                 return None
 
             order_id = order_data[0].get('orderId')
             if not order_id:
-                logging.error("注文IDが存在しません")
+                logger.error("注文IDが存在しません")
                 return None
 
+            # まずID索引を引く（get_all_positionsのキャッシュが温かい間はHTTP往復なし）
+            position = self._position_by_id.get(order_id)
+            if position is not None:
+                return position
+
             # 取引履歴から該当する取引を検索
-            response = self._make_request('GET', f'/accounts/{self.account_id}/trades')
+            response = self._make_request('GET', self._ep_trades)
 
             if response and 'trades' in response:
                 for trade in response['trades']:
                     if trade.get('id') == order_id:
                         oanda_symbol = trade.get('instrument', '')
-                        symbol = oanda_symbol.replace('/', '_')
+                        symbol = self._from_oanda_sym(oanda_symbol)
 
                         return Position(
                             position_id=trade.get('id', ''),
@@ -478,48 +847,50 @@ class OANDABroker(BrokerBase):
                             unrealized_pnl=float(trade.get('unrealizedPL', 0))
                         )
 
-            logging.error("ポジション情報が見つかりません")
+            logger.error("ポジション情報が見つかりません")
             return None
 
         except Exception as e:
-            logging.error(f"[{self.name}] ポジション情報取得エラー: {e}")
+            logger.error("[%s] ポジション情報取得エラー: %s", self.name, e)
             return None
 
-    def get_execution_fee(self, order_id: str) -> float:
-        """約定手数料を取得"""
-        try:
-            # OANDAの取引履歴から手数料を取得
-            response = self._make_request('GET', f'/accounts/{self.account_id}/transactions')
+    # 約定情報キャッシュの上限件数。約定済みトランザクションは不変なので
+    # TTLは不要で、古いものから追い出すだけでよい
+    _EXECUTION_CACHE_MAX = 256
 
-            if response and 'transactions' in response:
-                for transaction in response['transactions']:
-                    if (transaction.get('type') == 'ORDER_FILL' and
-                        transaction.get('id') == order_id):
-                        return float(transaction.get('commission', 0))
+    def _fetch_execution(self, order_id: str) -> Optional[Dict[str, Any]]:
+        """指定IDのトランザクションを単体取得する（上限付きキャッシュ）"""
+        cached = self._execution_cache.get(order_id)
+        if cached is not None:
+            return cached
 
-            return 0.0
+        try:
+            # コレクション全体を取って線形探索する代わりに単体エンドポイントを引く
+            # （ペイロードは取引履歴全件から該当1件の~1KBに縮む）
+            response = self._make_request(
+                'GET', f'{self._ep_transactions}/{order_id}')
+
+            fill = response.get('transaction') if response else None
+            if fill is not None:
+                if len(self._execution_cache) >= self._EXECUTION_CACHE_MAX:
+                    # 挿入順で最古のエントリを追い出す
+                    self._execution_cache.pop(next(iter(self._execution_cache)))
+                self._execution_cache[order_id] = fill
+            return fill
 
         except Exception as e:
-            logging.error(f"[{self.name}] 手数料取得エラー: {e}")
-            return 0.0
+            logger.error("[%s] 約定情報取得エラー: %s", self.name, e)
+            return None
+
+    def get_execution_fee(self, order_id: str) -> float:
+        """約定手数料を取得"""
+        fill = self._fetch_execution(order_id)
+        return float(fill.get('commission', 0)) if fill else 0.0
 
     def get_execution_price(self, order_id: str) -> float:
         """約定価格を取得"""
-        try:
-            # 取引履歴から約定価格を取得
-            response = self._make_request('GET', f'/accounts/{self.account_id}/transactions')
-
-            if response and 'transactions' in response:
-                for transaction in response['transactions']:
-                    if (transaction.get('type') == 'ORDER_FILL' and
-                        transaction.get('id') == order_id):
-                        return float(transaction.get('price', 0))
-
-            return 0.0
-
-        except Exception as e:
-            logging.error(f"[{self.name}] 約定価格取得エラー: {e}")
-            return 0.0
+        fill = self._fetch_execution(order_id)
+        return float(fill.get('price', 0)) if fill else 0.0
 
     def validate_config(self) -> bool:
         """設定の妥当性を検証"""
@@ -528,14 +899,14 @@ class OANDABroker(BrokerBase):
             return False
 
         if not self.account_id:
-            logging.error(f"[{self.name}] OANDAアカウントIDが設定されていません")
+            logger.error("[%s] OANDAアカウントIDが設定されていません", self.name)
             return False
         if not self.access_token:
-            logging.error(f"[{self.name}] OANDAアクセストークンが設定されていません")
+            logger.error("[%s] OANDAアクセストークンが設定されていません", self.name)
             return False
         if self.environment not in ['practice', 'live']:
-            logging.error(f"[{self.name}] 無効な環境設定: {self.environment}")
+            logger.error("[%s] 無効な環境設定: %s", self.name, self.environment)
             return False
 
-        logging.info(f"[{self.name}] OANDA設定検証成功")
+        logger.info(f"[{self.name}] OANDA設定検証成功")
         return True 
\ No newline at end of file
@@ -7,14 +7,13 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from bot_config import load_config
 from oanda_broker import OANDABroker
-import json
 
 def main():
-    # 設定ファイルを読み込み
+    # 設定ファイルを読み込み（共有ローダー経由）
     try:
-        with open('config.json', 'r', encoding='utf-8') as f:
-            config = json.load(f)
+        config = load_config()
     except FileNotFoundError:
         print("設定ファイル config.json が見つかりません")
         return
@@ -46,6 +45,8 @@ def main():
             
     except Exception as e:
         print(f"ポジション取得エラー: {e}")
+    finally:
+        broker.close()
 
 if __name__ == "__main__":
     main()
@@ -7,14 +7,14 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from bot_config import load_config
 from oanda_broker import OANDABroker
-import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 def main():
-    # 設定ファイルを読み込み
+    # 設定ファイルを読み込み（共有ローダー経由）
     try:
-        with open('config.json', 'r', encoding='utf-8') as f:
-            config = json.load(f)
+        config = load_config()
     except FileNotFoundError:
         print("設定ファイル config.json が見つかりません")
         return
@@ -31,29 +31,39 @@ def main():
     try:
         positions = broker.get_all_positions()
         print(f"\n現在のポジション数: {len(positions)}")
-        
+
         if not positions:
             print("クリアするポジションはありません")
             return
-        
-        # すべてのポジションをクリア
-        for pos in positions:
-            try:
+
+        # すべてのポジションを並行してクリアする
+        # （逐次だとN往復分待たされる。レート制限はブローカー側で管理される）
+        with ThreadPoolExecutor(max_workers=min(8, len(positions))) as executor:
+            futures = {}
+            for pos in positions:
                 print(f"ポジションをクリア中: {pos.symbol} {pos.side} {pos.size}")
-                result = broker.close_position(pos.symbol, pos.position_id, pos.size, pos.side)
-                if result:
-                    print(f"✓ ポジションクリア成功: {pos.symbol}")
-                else:
-                    print(f"✗ ポジションクリア失敗: {pos.symbol}")
-            except Exception as e:
-                print(f"✗ ポジションクリアエラー: {pos.symbol} - {e}")
-        
+                future = executor.submit(
+                    broker.close_position, pos.symbol, pos.position_id, pos.size, pos.side)
+                futures[future] = pos
+            for future in as_completed(futures):
+                pos = futures[future]
+                try:
+                    result = future.result()
+                    if result:
+                        print(f"✓ ポジションクリア成功: {pos.symbol}")
+                    else:
+                        print(f"✗ ポジションクリア失敗: {pos.symbol}")
+                except Exception as e:
+                    print(f"✗ ポジションクリアエラー: {pos.symbol} - {e}")
+
         # 最終確認
         final_positions = broker.get_all_positions()
         print(f"\nクリア後のポジション数: {len(final_positions)}")
-        
+
     except Exception as e:
         print(f"ポジション操作エラー: {e}")
+    finally:
+        broker.close()
 
 if __name__ == "__main__":
     main()
@@ -1,92 +1,38 @@
 #!/usr/bin/env python3
 """
-OANDA口座の既存ポジションをすべてクリアするスクリプト（REST API v20対応版）
+OANDA口座の既存ポジションをすべてクリアするスクリプト（OANDABroker経由版）
 """
 
-import os
-import json
 import sys
-import requests
-from typing import List, Dict
-
-
-def load_config() -> Dict:
-    """設定ファイルを読み込み"""
-    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-    cfg_path = os.path.join(root, 'config.json')
-    with open(cfg_path, 'r', encoding='utf-8') as f:
-        return json.load(f)
-
-
-def make_request(method: str, url: str, token: str, data: Dict = None) -> Dict:
-    """APIリクエスト実行"""
-    headers = {
-        'Authorization': f'Bearer {token}',
-        'Content-Type': 'application/json',
-        'Accept': 'application/json'
-    }
-
-    try:
-        if method == 'GET':
-            response = requests.get(url, headers=headers, timeout=30)
-        elif method == 'PUT':
-            response = requests.put(url, headers=headers, json=data, timeout=30)
-        elif method == 'DELETE':
-            response = requests.delete(url, headers=headers, timeout=30)
-        else:
-            raise ValueError(f"Unsupported method: {method}")
-
-        response.raise_for_status()
-        return response.json()
-
-    except requests.exceptions.RequestException as e:
-        print(f"APIリクエストエラー: {e}", file=sys.stderr)
-        sys.exit(1)
-
-
-def summarize_positions(resp: Dict) -> List[Dict]:
-    """ポジション情報を整理"""
-    out = []
-    if 'positions' in resp:
-        for p in resp['positions']:
-            instrument = p.get('instrument')
-            long_data = p.get('long', {})
-            short_data = p.get('short', {})
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-            long_units = float(long_data.get('units', 0))
-            short_units = float(short_data.get('units', 0))
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-            out.append({
-                'instrument': instrument,
-                'long_units': long_units,
-                'short_units': short_units,
-                'long_price': float(long_data.get('averagePrice', 0)),
-                'short_price': float(short_data.get('averagePrice', 0)),
-            })
-    return out
+from bot_config import load_config
+from oanda_broker import OANDABroker
 
 
 def main():
-    cfg = load_config()
-    account_id = cfg.get('oanda_account_id')
-    token = cfg.get('oanda_access_token')
-    env = cfg.get('oanda_environment', 'practice')
+    try:
+        cfg = load_config()
+    except FileNotFoundError:
+        print('設定エラー: config.json が見つかりません', file=sys.stderr)
+        sys.exit(2)
 
-    if not account_id or not token:
+    if not cfg.get('oanda_account_id') or not cfg.get('oanda_access_token'):
         print('設定エラー: oanda_account_id または oanda_access_token が設定されていません', file=sys.stderr)
         sys.exit(2)
 
-    # APIエンドポイント設定
-    if env == 'live':
-        base_url = "https://api-fxtrade.oanda.com/v3"
-    else:
-        base_url = "https://api-fxpractice.oanda.com/v3"
+    # ブローカー初期化（セッション共有・レート制限・接続プールはブローカー側で管理される）
+    try:
+        broker = OANDABroker(cfg)
+    except Exception as e:
+        print(f"ブローカー初期化エラー: {e}", file=sys.stderr)
+        sys.exit(1)
 
-    # 現在のポジションを取得
     try:
-        positions_url = f"{base_url}/accounts/{account_id}/positions"
-        resp = make_request('GET', positions_url, token)
-        positions = summarize_positions(resp)
+        positions = broker.get_all_positions()
 
         print('現在のポジション:')
         if not positions:
@@ -94,61 +40,35 @@ def main():
             return
 
         for pos in positions:
-            print(f"- {pos['instrument']}: ロング={pos['long_units']} @ {pos['long_price']} | ショート={pos['short_units']} @ {pos['short_price']}")
+            label = 'ロング' if pos.side == 'BUY' else 'ショート'
+            print(f"- {pos.symbol}: {label}={pos.size} @ {pos.price}")
 
-        # すべてのポジションを決済
+        # すべてのポジションを決済（各決済を並行して発注する）
         print('\nポジションを決済中...')
-        for pos in positions:
-            instrument = pos['instrument']
-
-            if pos['long_units'] > 0:
-                # ロングポジションを決済（売り）
-                order_data = {
-                    "order": {
-                        "type": "MARKET",
-                        "instrument": instrument,
-                        "units": -int(pos['long_units']),
-                        "timeInForce": "FOK"
-                    }
-                }
-
+        with ThreadPoolExecutor(max_workers=min(8, len(positions))) as executor:
+            futures = {}
+            for pos in positions:
+                future = executor.submit(
+                    broker.close_position, pos.symbol, pos.position_id, pos.size, pos.side)
+                futures[future] = pos
+            for future in as_completed(futures):
+                pos = futures[future]
+                label = 'ロング' if pos.side == 'BUY' else 'ショート'
                 try:
-                    order_url = f"{base_url}/accounts/{account_id}/orders"
-                    close_resp = make_request('POST', order_url, token, order_data)
-                    if 'orderFillTransaction' in close_resp:
-                        print(f"✓ ロングポジション決済完了: {instrument}")
+                    result = future.result()
+                    if result is not None:
+                        print(f"✓ {label}ポジション決済完了: {pos.symbol}")
                     else:
-                        print(f"✗ ロングポジション決済失敗: {instrument}")
+                        print(f"✗ {label}ポジション決済失敗: {pos.symbol}")
                 except Exception as e:
-                    print(f"✗ ロングポジション決済エラー {instrument}: {e}")
-
-            if pos['short_units'] > 0:
-                # ショートポジションを決済（買い）
-                order_data = {
-                    "order": {
-                        "type": "MARKET",
-                        "instrument": instrument,
-                        "units": int(pos['short_units']),
-                        "timeInForce": "FOK"
-                    }
-                }
-
-                try:
-                    order_url = f"{base_url}/accounts/{account_id}/orders"
-                    close_resp = make_request('POST', order_url, token, order_data)
-                    if 'orderFillTransaction' in close_resp:
-                        print(f"✓ ショートポジション決済完了: {instrument}")
-                    else:
-                        print(f"✗ ショートポジション決済失敗: {instrument}")
-                except Exception as e:
-                    print(f"✗ ショートポジション決済エラー {instrument}: {e}")
+                    print(f"✗ {label}ポジション決済エラー {pos.symbol}: {e}")
 
     except Exception as e:
         print(f"エラー: {e}", file=sys.stderr)
         sys.exit(1)
+    finally:
+        broker.close()
 
 
 if __name__ == '__main__':
     main()
-
-
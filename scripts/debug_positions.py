@@ -7,14 +7,13 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from bot_config import load_config
 from oanda_broker import OANDABroker
-import json
 
 def main():
-    # 設定ファイルを読み込み
+    # 設定ファイルを読み込み（共有ローダー経由）
     try:
-        with open('config.json', 'r', encoding='utf-8') as f:
-            config = json.load(f)
+        config = load_config()
     except FileNotFoundError:
         print("設定ファイル config.json が見つかりません")
         return
@@ -34,6 +33,8 @@ def main():
         
         if positions:
             print("\n=== ポジション詳細（デバッグ） ===")
+            # 属性一覧は全ポジションで共通なのでループ外で一度だけ取得する
+            cls_attrs = dir(type(positions[0]))
             for i, pos in enumerate(positions):
                 print(f"ポジション {i+1}:")
                 print(f"  通貨ペア: {pos.symbol}")
@@ -43,13 +44,15 @@ def main():
                 print(f"  ポジションID: '{pos.position_id}'")
                 print(f"  ポジションIDの型: {type(pos.position_id)}")
                 print(f"  ポジションIDの長さ: {len(str(pos.position_id)) if pos.position_id else 0}")
-                print(f"  全属性: {dir(pos)}")
+                print(f"  全属性: {cls_attrs}")
                 print("---")
         else:
             print("現在ポジションはありません")
             
     except Exception as e:
         print(f"ポジション取得エラー: {e}")
+    finally:
+        broker.close()
 
 if __name__ == "__main__":
     main()
@@ -2,11 +2,25 @@
 from __future__ import annotations
 
 import csv
+import re
+from bisect import bisect_left
 from dataclasses import dataclass
+from functools import lru_cache
+from time import monotonic
 from datetime import datetime, date, time, timedelta
 from typing import List, Protocol, Optional
 from zoneinfo import ZoneInfo
 
+try:
+    import numpy as np
+except ImportError:
+    np = None  # NumPy未導入環境ではPythonループで計算する
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None  # pandas未導入環境ではcsvモジュールで読み込む
+
 JST = ZoneInfo("Asia/Tokyo")          # デフォルトタイムゾーン
 TRADING_DAY_START = time(6, 0)       # 取引日境界（06:00 JST）
 
@@ -16,12 +30,28 @@ class Clock(Protocol):
 
 
 class SystemClock:
-    """テスト容易性向上のための依存性注入可能な時計"""
-    def __init__(self, tz: ZoneInfo = JST):
+    """テスト容易性向上のための依存性注入可能な時計
+
+    ポーリングループから毎tick複数回呼ばれるため、monotonicベースの
+    粗いキャッシュ（既定100ms）で同一ウィンドウ内のsyscall+tz変換を省く。
+    """
+    def __init__(self, tz: ZoneInfo = JST, resolution_s: float = 0.1):
         self._tz = tz
+        self._resolution_s = resolution_s
+        self._cached: Optional[datetime] = None
+        self._cached_mono = 0.0
 
     def now(self) -> datetime:
-        return datetime.now(self._tz)
+        m = monotonic()
+        if self._cached is not None and m - self._cached_mono < self._resolution_s:
+            return self._cached
+        self._cached = datetime.now(self._tz)
+        self._cached_mono = m
+        return self._cached
+
+    def invalidate(self) -> None:
+        """キャッシュを破棄して次回now()で再取得させる（テスト用）"""
+        self._cached = None
 
 
 @dataclass(frozen=True)
@@ -37,13 +67,13 @@ class TradeWindow:
                            timedelta(seconds=buffer_seconds))
 
     def window_for(self, ref: datetime) -> tuple[datetime, datetime]:
-        """ref の取引日における entry/exit の絶対値 (aware) を返す"""
-        trading_day = _trading_day_of(ref)
-        entry_dt = datetime.combine(trading_day, self.entry, ref.tzinfo)
-        exit_dt  = datetime.combine(trading_day, self.exit,  ref.tzinfo)
-        if exit_dt <= entry_dt:               # 日跨ぎ補正
-            exit_dt += timedelta(days=1)
-        return entry_dt, exit_dt
+        """ref の取引日における entry/exit の絶対値 (aware) を返す
+
+        純関数なので (entry, exit, 取引日, tz) でメモ化しており、
+        同一取引日内の is_open/is_entry_point/is_exit_point 連打では
+        datetime.combine を再実行しない。
+        """
+        return _window_for(self.entry, self.exit, _trading_day_of(ref), ref.tzinfo)
 
     def is_open(self, now: datetime) -> bool:
         entry_dt, exit_dt = self.window_for(now)
@@ -84,12 +114,33 @@ class TradeData:
         )
 
 
+# 'HH:MM[:SS]' 形式（前後空白許容）。行ごとのsplit+リスト生成を避ける
+_TIME_RE = re.compile(r'^\s*(\d{1,2}):(\d{1,2})(?::(\d{1,2}))?\s*$')
+
+
 def _parse_time(ts: str) -> time:
-    """'HH:MM[:SS]' を許容し、不足分は 0 で補完"""
-    parts = [int(p) for p in ts.strip().split(":")]
-    while len(parts) < 3:
-        parts.append(0)
-    return time(*parts[:3])
+    """'HH:MM[:SS]' を許容し、秒省略時は 0 で補完"""
+    m = _TIME_RE.match(ts)
+    if not m:
+        raise ValueError(f"時刻形式が不正です: {ts!r}")
+    h, mnt, s = m.groups()
+    return time(int(h), int(mnt), int(s) if s else 0)
+
+
+@lru_cache(maxsize=8)
+def _window_for(entry: time, exit: time, trading_day: date,
+                tzinfo) -> tuple[datetime, datetime]:
+    """取引日ごとのentry/exit絶対時刻を計算する（引数キーでメモ化）"""
+    entry_dt = datetime.combine(trading_day, entry, tzinfo)
+    exit_dt = datetime.combine(trading_day, exit, tzinfo)
+    if exit_dt <= entry_dt:               # 日跨ぎ補正
+        exit_dt += timedelta(days=1)
+    return entry_dt, exit_dt
+
+
+def _seconds_of_day(t: time) -> int:
+    """time を 0時起点の秒数に変換"""
+    return t.hour * 3600 + t.minute * 60 + t.second
 
 
 def _trading_day_of(dt: datetime) -> date:
@@ -99,17 +150,63 @@ def _trading_day_of(dt: datetime) -> date:
     return dt.date()
 
 
+def _load_trades_pandas(path: str) -> List[TradeData]:
+    """pandasでtrades.csvを読み込む（from_csvの高速経路）"""
+    df = pd.read_csv(path, dtype=str, keep_default_na=False)
+    trades: List[TradeData] = []
+    ncols = df.shape[1]
+    if ncols < 5:
+        return trades
+
+    for row_num, row in enumerate(df.itertuples(index=False, name=None), start=2):
+        fields = [str(v).strip() for v in row[:5]]
+        if not all(fields):  # 必須フィールド欠落行はスキップ
+            continue
+        try:
+            trades.append(TradeData(
+                trade_number=fields[0],
+                direction=fields[1],
+                symbol=fields[2],
+                entry_time=_parse_time(fields[3]),
+                exit_time=_parse_time(fields[4]),
+                lot_size=str(row[5]).strip() if ncols > 5 else None
+            ))
+        except (ValueError, IndexError) as e:
+            print(f"行{row_num}: データ形式エラー - {e}")
+            continue
+
+    return trades
+
+
 class TradeSchedule:
     def __init__(self, trades: List[TradeData], clock: Clock | None = None):
-        self._trades = trades
+        # エントリー時刻は不変なので構築時に一度だけソートしておく
+        # （get_trades_for_todayの毎tickソートを不要にする）
+        self._trades = sorted(trades, key=lambda t: (t.entry_time, t.exit_time))
+        trades = self._trades
         self._clock = clock or SystemClock()
 
+        # ホットなポーリング判定用にエントリー/決済時刻を秒数へ事前変換しておく
+        # （毎tickのdatetime.combine生成を避ける。NumPyがあればベクトル比較）
+        entry_sod = [_seconds_of_day(t.entry_time) for t in trades]
+        exit_sod = [_seconds_of_day(t.exit_time) for t in trades]
+        if np is not None:
+            self._entry_sod = np.array(entry_sod, dtype=np.int32)
+            self._exit_sod = np.array(exit_sod, dtype=np.int32)
+        else:
+            self._entry_sod = entry_sod
+            self._exit_sod = exit_sod
+
     @classmethod
     def from_csv(cls, path: str, buffer_seconds: int = 5,
                  clock: Clock | None = None) -> "TradeSchedule":
         """元のtrades.csv形式からTradeScheduleを作成"""
+        # pandasがあればCのCSVトークナイザで読み込む（行ループより大幅に速い）
+        if pd is not None:
+            return cls(_load_trades_pandas(path), clock)
+
         trades: List[TradeData] = []
-        
+
         with open(path, newline="", encoding='utf-8') as fh:
             reader = csv.reader(fh)
             header = next(reader)  # ヘッダー行をスキップ
@@ -120,17 +217,14 @@ class TradeSchedule:
                 
                 try:
                     # 必須フィールドの検証
-                    if not all([row[0].strip(), row[1].strip(), row[2].strip(), 
+                    if not all([row[0].strip(), row[1].strip(), row[2].strip(),
                                row[3].strip(), row[4].strip()]):
                         continue
-                    
-                    # 時刻形式の検証
-                    _parse_time(row[3].strip())
-                    _parse_time(row[4].strip())
-                    
+
+                    # 時刻検証はfrom_csv_row内の解析で兼ねる（二重パースしない）
                     trade_data = TradeData.from_csv_row(row)
                     trades.append(trade_data)
-                    
+
                 except (ValueError, IndexError) as e:
                     print(f"行{row_num}: データ形式エラー - {e}")
                     continue
@@ -142,79 +236,42 @@ class TradeSchedule:
         return self._clock.now()
 
     def get_trades_for_today(self) -> List[TradeData]:
-        """今日の取引データを取得"""
+        """今日の取引データを次回実行順に取得
+
+        _tradesはエントリー時刻で事前ソート済みなので、現在時刻より前の
+        エントリー（＝次の実行は翌日）を後ろへ回すだけでよい。
+        従来の毎回のdatetime.combine+ソートは不要になった。
+        """
         now = self.now()
-        today_trades = []
-        
-        for trade in self._trades:
-            # エントリー時刻を今日の日付でdatetimeに変換
-            entry_dt = datetime.combine(now.date(), trade.entry_time, now.tzinfo)
-            exit_dt = datetime.combine(now.date(), trade.exit_time, now.tzinfo)
-            
-            # 日を跨ぐ取引の場合は翌日に調整
-            if exit_dt <= entry_dt:
-                exit_dt += timedelta(days=1)
-            
-            # 現在時刻より前の場合は翌日に調整
-            if entry_dt < now:
-                entry_dt += timedelta(days=1)
-                exit_dt += timedelta(days=1)
-            
-            today_trades.append((entry_dt, trade))
-        
-        # エントリー時刻でソート
-        today_trades.sort(key=lambda x: x[0])
-        return [trade for _, trade in today_trades]
+        now_sod = now.hour * 3600 + now.minute * 60 + now.second
 
-    def should_enter(self) -> bool:
-        """エントリー条件をチェック"""
+        # 現在時刻以降の最初のエントリー位置を二分探索で求めて回転する
+        idx = bisect_left(self._entry_sod, now_sod)
+        return self._trades[idx:] + self._trades[:idx]
+
+    def _within_buffer(self, target_sod) -> bool:
+        """現在時刻がいずれかの対象時刻の±5秒以内か（日跨ぎは循環距離で吸収）"""
         now = self.now()
-        
-        for trade in self._trades:
-            # エントリー時刻を今日の日付でdatetimeに変換
-            entry_dt = datetime.combine(now.date(), trade.entry_time, now.tzinfo)
-            
-            # 現在時刻より前の場合は翌日に調整（ただし、今日の取引がまだ実行されていない場合のみ）
-            if entry_dt < now:
-                # 今日の取引が既に実行されているかチェック
-                today_key = f"{now.date()}_{trade.trade_number}"
-                if today_key not in self._executed_trades:
-                    entry_dt += timedelta(days=1)
-            
-            # バッファ時間内かチェック
-            time_diff = abs((now - entry_dt).total_seconds())
-            print(f"DEBUG: should_enter - now={now}, entry_dt={entry_dt}, time_diff={time_diff}")
-            if time_diff <= 5:  # 5秒のバッファ
-                print(f"DEBUG: should_enter - TRUE for trade {trade.trade_number}")
+        now_sod = now.hour * 3600 + now.minute * 60 + now.second
+
+        if np is not None:
+            diff = np.abs(target_sod - now_sod)
+            # 0時前後をまたぐケースは 86400 - diff 側が最短距離になる
+            return bool(np.any(np.minimum(diff, 86400 - diff) <= 5))
+
+        for sod in target_sod:
+            diff = abs(sod - now_sod)
+            if min(diff, 86400 - diff) <= 5:
                 return True
-        
-        print(f"DEBUG: should_enter - FALSE")
         return False
 
+    def should_enter(self) -> bool:
+        """エントリー条件をチェック（いずれかのエントリー時刻の±5秒以内）"""
+        return self._within_buffer(self._entry_sod)
+
     def should_exit(self) -> bool:
-        """決済条件をチェック"""
-        now = self.now()
-        
-        for trade in self._trades:
-            # 決済時刻を今日の日付でdatetimeに変換
-            exit_dt = datetime.combine(now.date(), trade.exit_time, now.tzinfo)
-            
-            # 現在時刻より前の場合は翌日に調整（ただし、今日の取引がまだ実行されていない場合のみ）
-            if exit_dt < now:
-                # 今日の取引が既に実行されているかチェック
-                today_key = f"{now.date()}_{trade.trade_number}"
-                if today_key not in self._executed_trades:
-                    exit_dt += timedelta(days=1)
-            
-            # バッファ時間内かチェック
-            time_diff = abs((now - exit_dt).total_seconds())
-            print(f"DEBUG: should_exit - now={now}, exit_dt={exit_dt}, time_diff={time_diff}")
-            if time_diff <= 5:  # 5秒のバッファ
-                print(f"DEBUG: should_exit - TRUE for trade {trade.trade_number}")
-                return True
-        
-        print(f"DEBUG: should_exit - FALSE")
-        return False
+        """決済条件をチェック（いずれかの決済時刻の±5秒以内）"""
+        return self._within_buffer(self._exit_sod)
 
     def get_next_trade(self) -> Optional[TradeData]:
         """次の取引を取得"""
@@ -222,25 +279,23 @@ class TradeSchedule:
         return today_trades[0] if today_trades else None
 
     def get_active_trades(self) -> List[TradeData]:
-        """現在アクティブな取引を取得"""
+        """現在アクティブな（エントリー〜決済の時間帯内にある）取引を取得"""
         now = self.now()
+        now_sod = now.hour * 3600 + now.minute * 60 + now.second
+
+        if np is not None:
+            overnight = self._exit_sod <= self._entry_sod  # 日跨ぎ取引
+            in_window = (self._entry_sod <= now_sod) & (now_sod <= self._exit_sod)
+            in_overnight = overnight & ((self._entry_sod <= now_sod) | (now_sod <= self._exit_sod))
+            mask = np.where(overnight, in_overnight, in_window)
+            return [self._trades[i] for i in np.flatnonzero(mask)]
+
         active_trades = []
-        
-        for trade in self._trades:
-            entry_dt = datetime.combine(now.date(), trade.entry_time, now.tzinfo)
-            exit_dt = datetime.combine(now.date(), trade.exit_time, now.tzinfo)
-            
-            # 日を跨ぐ取引の場合は翌日に調整
-            if exit_dt <= entry_dt:
-                exit_dt += timedelta(days=1)
-            
-            # 現在時刻より前の場合は翌日に調整
-            if entry_dt < now:
-                entry_dt += timedelta(days=1)
-                exit_dt += timedelta(days=1)
-            
-            # 現在時刻が取引時間内かチェック
-            if entry_dt <= now <= exit_dt:
+        for trade, entry_sod, exit_sod in zip(self._trades, self._entry_sod, self._exit_sod):
+            if exit_sod <= entry_sod:  # 日跨ぎ取引
+                active = entry_sod <= now_sod or now_sod <= exit_sod
+            else:
+                active = entry_sod <= now_sod <= exit_sod
+            if active:
                 active_trades.append(trade)
-        
         return active_trades 
\ No newline at end of file